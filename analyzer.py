@@ -3,22 +3,33 @@ import asyncio
 import os
 import time
 import datetime
-import pytz
 import json
+import hashlib # For cache keys
+import sqlite3 # For the local Gemini response cache
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import gspread
+import numpy as np
 import pandas as pd
 import google.generativeai as genai
 import backoff
+from aiolimiter import AsyncLimiter
 from dotenv import load_dotenv
+from google.auth.transport.requests import AuthorizedSession
 from google.oauth2.service_account import Credentials
 import csv # Import csv module
 import re # Import regex module for cleaning
 import argparse # Add argparse
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 # --- Load Environment Variables --- #
 load_dotenv()
 
+# All 'string' dtype columns use arrow storage (compact, fast) without
+# having to spell out the backend at every construction site.
+pd.set_option('mode.string_storage', 'pyarrow')
+
 # --- Argument Parser --- #
 parser = argparse.ArgumentParser(description='Analyze and rewrite content from different platforms.')
 parser.add_argument('--platform', type=str.lower, required=True, choices=['twitter', 'reddit'],
@@ -34,6 +45,11 @@ TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 SERVICE_ACCOUNT_FILE = os.getenv('SERVICE_ACCOUNT_FILE_PATH', 'service_account.json')
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 GEMINI_CONCURRENT_REQUESTS = int(os.getenv('GEMINI_CONCURRENT_REQUESTS', '1'))
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '6'))
+GEMINI_MODEL_NAME = os.getenv('GEMINI_MODEL_NAME', 'gemini-1.5-flash')
+GEMINI_CACHE_FILE = os.getenv('GEMINI_CACHE_FILE', 'gemini_cache.db')
+GEMINI_CACHE_TTL_SECONDS = int(os.getenv('GEMINI_CACHE_TTL_DAYS', '30')) * 86400
+GEMINI_PROMPT_VERSION = 'v1' # Bump to invalidate cached rewrites when prompts change
 TARGET_TIMEZONE_STR = os.getenv('TARGET_TIMEZONE', 'UTC')
 # Load the single main Google Sheet URL
 GOOGLE_SHEETS_URL = os.getenv('GOOGLE_SHEETS_URL')
@@ -52,6 +68,10 @@ else:
     print(f"Error: Invalid platform specified: {PLATFORM}")
     exit()
 
+# Compacted Parquet snapshot of the local state; the CSV file acts as an
+# append-only journal between compactions (see load_local_state below).
+LOCAL_STATE_PARQUET = os.path.splitext(LOCAL_STATE_FILE)[0] + '.parquet'
+
 print(f"  Using Google Sheet URL: {GOOGLE_SHEETS_URL}")
 print(f"  Source Sheet Names: {SOURCE_SHEET_NAMES_STR}")
 print(f"  Target Analyzed Sheet Name: {TARGET_SHEET_NAME}")
@@ -91,9 +111,21 @@ if GEMINI_CONCURRENT_REQUESTS <= 0:
 # --- Initialize Services --- #
 gemini_model = None
 worksheet_tgt = None
-TARGET_TIMEZONE = pytz.utc
+TARGET_TIMEZONE = datetime.timezone.utc
+
+# Shared retry policy for chatty HTTPS APIs: transient 429/5xx responses
+# are retried with exponential backoff at the transport layer.
+# allowed_methods=None retries every verb - urllib3's default set
+# excludes POST, which is exactly what the Telegram and Sheets calls
+# use; these requests are safe to repeat here.
+HTTP_RETRY = Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                   allowed_methods=None)
+
+# Telegram - one pooled session so each notification reuses the warm
+# TCP+TLS connection instead of paying a fresh handshake.
+telegram_session = requests.Session()
+telegram_session.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=HTTP_RETRY))
 
-# Telegram
 def send_telegram_notification(message):
     """Sends a notification message to the configured Telegram chat."""
     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
@@ -104,7 +136,7 @@ def send_telegram_notification(message):
     truncated_message = message[:max_len] if len(message) > max_len else message
     payload = {'chat_id': TELEGRAM_CHAT_ID, 'text': truncated_message}
     try:
-        response = requests.post(send_url, json=payload, timeout=15)
+        response = telegram_session.post(send_url, json=payload, timeout=15)
         response.raise_for_status()
         print(f"Sent Telegram notification: {truncated_message[:70].splitlines()[0]}...")
     except requests.exceptions.RequestException as e:
@@ -112,6 +144,13 @@ def send_telegram_notification(message):
     except Exception as e:
         print(f"An unexpected error occurred during Telegram notification sending: {e}")
 
+async def send_telegram_notification_async(message):
+    """Async variant for use inside the event loop - the pooled requests
+    call runs in a worker thread so a slow Telegram round-trip never
+    stalls in-flight rewrite workers. Sync paths (startup, top-level
+    handlers) keep calling the blocking version directly."""
+    await asyncio.to_thread(send_telegram_notification, message)
+
 # Google Sheets Initialization
 # Authenticate using service account
 print("Authenticating with Google...")
@@ -122,7 +161,11 @@ try:
         'https://www.googleapis.com/auth/drive.file'
     ]
     creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SHEET_SCOPES)
-    gc = gspread.authorize(creds)
+    # Authorized session with connection pooling + transport-level retries;
+    # every gspread call reuses it instead of opening a fresh connection.
+    sheets_session = AuthorizedSession(creds)
+    sheets_session.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=16, max_retries=HTTP_RETRY))
+    gc = gspread.Client(auth=creds, session=sheets_session)
 
     # Open the single Google Sheet file
     print(f"Opening Google Sheet file: {GOOGLE_SHEETS_URL}")
@@ -147,7 +190,7 @@ except Exception as e:
 # Gemini
 try:
     genai.configure(api_key=GEMINI_API_KEY)
-    gemini_model = genai.GenerativeModel('gemini-1.5-flash') # Or your preferred model
+    gemini_model = genai.GenerativeModel(GEMINI_MODEL_NAME) # Or your preferred model
     print("Gemini API configured successfully.")
 except Exception as e:
     error_msg = f"CRITICAL ERROR: Failed to configure Gemini API: {e}"
@@ -155,71 +198,283 @@ except Exception as e:
     send_telegram_notification(f"🚨 {error_msg}")
     exit()
 
-# Timezone
+# Timezone (stdlib zoneinfo - C-backed, no pytz localize footgun)
 try:
-    TARGET_TIMEZONE = pytz.timezone(TARGET_TIMEZONE_STR)
-except pytz.exceptions.UnknownTimeZoneError:
+    TARGET_TIMEZONE = ZoneInfo(TARGET_TIMEZONE_STR)
+except ZoneInfoNotFoundError:
     print(f"Warning: Unknown timezone '{TARGET_TIMEZONE_STR}'. Defaulting to UTC.")
     # TARGET_TIMEZONE remains UTC
 
+# Gemini Response Cache (SQLite)
+# Re-runs over the same source data would otherwise re-pay the full Gemini
+# token cost for identical inputs, so cache successful rewrites on disk.
+gemini_cache_conn = None
+try:
+    gemini_cache_conn = sqlite3.connect(GEMINI_CACHE_FILE)
+    gemini_cache_conn.execute(
+        "CREATE TABLE IF NOT EXISTS rewrite_cache (key TEXT PRIMARY KEY, en TEXT, ru TEXT, ts REAL)"
+    )
+    gemini_cache_conn.commit()
+    print(f"Gemini response cache ready at '{GEMINI_CACHE_FILE}'.")
+except Exception as e:
+    print(f"Warning: Could not initialize Gemini response cache '{GEMINI_CACHE_FILE}': {e}. Proceeding without cache.")
+    gemini_cache_conn = None
+
+def gemini_cache_key(original_text, content_type):
+    """Builds a stable cache key for a rewrite request."""
+    raw = f"{GEMINI_MODEL_NAME}|{GEMINI_PROMPT_VERSION}|{content_type}|{original_text}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def gemini_cache_get(key):
+    """Returns a cached (en, ru) pair for the key, or None on miss/expiry."""
+    if gemini_cache_conn is None:
+        return None
+    try:
+        row = gemini_cache_conn.execute(
+            "SELECT en, ru, ts FROM rewrite_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        en, ru, ts = row
+        if time.time() - ts > GEMINI_CACHE_TTL_SECONDS:
+            gemini_cache_conn.execute("DELETE FROM rewrite_cache WHERE key = ?", (key,))
+            gemini_cache_conn.commit()
+            return None
+        return en, ru
+    except Exception as e:
+        print(f"Warning: Gemini cache read failed: {e}")
+        return None
+
+def gemini_cache_set(key, rewritten_en, rewritten_ru):
+    """Stores a successful (en, ru) rewrite pair. Error outputs are never cached."""
+    if gemini_cache_conn is None:
+        return
+    if rewritten_en.startswith('Error:') or rewritten_ru.startswith('Error:'):
+        return
+    try:
+        gemini_cache_conn.execute(
+            "INSERT OR REPLACE INTO rewrite_cache (key, en, ru, ts) VALUES (?, ?, ?, ?)",
+            (key, rewritten_en, rewritten_ru, time.time())
+        )
+        gemini_cache_conn.commit()
+    except Exception as e:
+        print(f"Warning: Gemini cache write failed: {e}")
+
 # --- Helper Functions --- #
+def _a1_col(col_name):
+    """Returns the A1 column letter for a TARGET_COLUMNS entry."""
+    return gspread.utils.rowcol_to_a1(1, TARGET_COLUMNS.index(col_name) + 1).rstrip('1')
+
+def _file_nonempty(path):
+    """True if path exists with content - one stat() instead of exists+getsize."""
+    try:
+        return os.stat(path).st_size > 0
+    except OSError:
+        return False
+
 # Function to load processed URLs from various sources
-def load_processed_urls(df):
-    """Extracts a set of successfully processed URLs from a DataFrame."""
+def load_processed_urls(urls, rewritten_en, rewritten_ru):
+    """Extracts a set of successfully processed URLs from parallel URL/EN/RU Series.
+
+    Takes just the three columns that matter instead of a full state frame,
+    so callers never have to materialize columns they don't need."""
     processed_urls = set()
-    # Ensure target columns exist before attempting to filter
-    required_cols = ['First Tweet URL', 'Rewritten EN', 'Rewritten RU']
-    if df is not None and not df.empty and all(col in df.columns for col in required_cols):
-        try:
-            # Convert rewrite columns to string before checking startswith
-            df['Rewritten EN'] = df['Rewritten EN'].astype(str)
-            df['Rewritten RU'] = df['Rewritten RU'].astype(str)
-
-            processed_df = df[
-                df['First Tweet URL'].notna() &
-                (df['Rewritten EN'].fillna('') != '') &
-                (df['Rewritten RU'].fillna('') != '') &
-                (~df['Rewritten EN'].str.startswith('Error:', na=False)) &
-                (~df['Rewritten RU'].str.startswith('Error:', na=False))
-            ]
-            processed_urls = set(processed_df['First Tweet URL'].astype(str))
-        except Exception as e:
-            print(f"Error processing DataFrame in load_processed_urls: {e}")
-            # Fallback to empty set if processing fails
-            processed_urls = set()
+    try:
+        urls = urls.astype(str)
+        rewritten_en = rewritten_en.astype(str)
+        rewritten_ru = rewritten_ru.astype(str)
+
+        processed_mask = (
+            urls.notna() &
+            (rewritten_en.fillna('') != '') &
+            (rewritten_ru.fillna('') != '') &
+            (~rewritten_en.str.startswith('Error:', na=False)) &
+            (~rewritten_ru.str.startswith('Error:', na=False))
+        )
+        processed_urls = set(urls[processed_mask])
+    except Exception as e:
+        print(f"Error in load_processed_urls: {e}")
+        # Fallback to empty set if processing fails
+        processed_urls = set()
     return processed_urls
 
+# --- Content Filters --- #
+RELEVANT_KEYWORDS = [
+    'ai', 'agi', 'openai', 'google', 'gemini', 'claude', 'mistral', 'llm',
+    'model', 'automation', ' n8n', 'python', 'api', 'workflow', 'data',
+    'tech', 'business', 'startup', 'rahmetlabs', 'scraping', 'analyze',
+    'process', 'update', 'news', 'release', 'research', 'paper', 'opinion',
+    'thought', 'develop', 'build', 'future', 'risk', 'safety', 'alignment',
+    'code', 'coding', 'launch', 'feature', 'limit', 'rate limit', 'context window',
+    'token', 'prompt', 'engineer', 'benchmark', 'test'
+] # Expanded keyword list
+# Compiled once at import; longest alternatives first so the engine can
+# short-circuit instead of retrying shorter prefixes.
+KEYWORD_RE = re.compile(
+    '|'.join(re.escape(k) for k in sorted(RELEVANT_KEYWORDS, key=len, reverse=True)),
+    re.IGNORECASE)
+
+# Markers that indicate a tweet is itself a prompt/template rather than
+# content worth rewriting. Compiled into one alternation so the whole
+# column is scanned in a single vectorized pass; all alternatives are
+# plain literals, so the engine never backtracks.
+PROMPT_MARKERS = ['# Prompt', '<Role>', '<Instructions>', '<Context>']
+PROMPT_RE = re.compile('|'.join(re.escape(m) for m in PROMPT_MARKERS), re.IGNORECASE)
+
+# --- Gemini Prompt --- #
+# Static instruction block shared by every rewrite call. Keep this constant
+# (never interpolate per-item data into it) so the prefix stays byte-identical
+# across calls and remains eligible for Gemini's implicit prompt caching.
+# Dynamic content goes strictly after the ---INPUT--- marker.
+PROMPT_PREFIX_EN_RU = """Act as the Rahmet Labs AI Copywriter. Your voice is direct, practical, tech-savvy but grounded (no hype), professionally informal, transparent, and confidently focused on tangible outcomes. Analyze the raw input below (notes, tweet, news) and rewrite it TWICE: once in English and once in Russian, both as clear, concise, engaging copy reflecting the Rahmet Labs brand. Focus on problem/solution framing and real-world applications. A touch of dry wit or skepticism towards hype is okay. Format each rewrite for readability using appropriate paragraph breaks. Ensure neither rewrite contains any hashtags (#). AVOID: Corporate buzzwords, marketing hype (revolutionary, game-changer, etc.), vague platitudes, overly complex sentences, passive voice. The Russian version must read as authentic Rahmet Labs communication in its own right, not a literal translation.
+---INPUT---
+"""
+
+PROMPT_SUFFIX_EN_RU = """
+---END---
+Return JSON with exactly two string fields: {"en": "<English rewrite>", "ru": "<Russian rewrite>"}"""
+
+# --- Local State Persistence --- #
+# Local state lives in two pieces: a typed, zstd-compressed Parquet
+# snapshot that loads in O(1) schema time, plus the CSV journal that rows
+# are appended to incrementally while a run is in flight (so a crash never
+# loses completed rewrites). The journal is folded into the snapshot once
+# the processing loop finishes.
+def _combine_state_frames(frames, wanted):
+    """Concatenates snapshot/journal frames into one wanted-column frame."""
+    if not frames:
+        return pd.DataFrame(columns=wanted)
+    df = pd.concat(frames, ignore_index=True)
+    # keep_default_na=False on the journal read and the str-typed snapshot
+    # writes mean NA can only appear in columns that concat had to invent
+    # because one side lacked them (schema drift between snapshot and
+    # journal). Fill just those instead of a full-frame fillna pass.
+    if len(frames) > 1:
+        partial_cols = [c for c in df.columns
+                        if not all(c in frame.columns for frame in frames)]
+        for col in partial_cols:
+            df[col] = df[col].fillna('')
+    # Ensure all requested columns exist after load
+    for col in wanted:
+        if col not in df.columns:
+            df[col] = ''
+    return df[wanted] # Reorder/select
+
+def load_local_state(columns=None):
+    """Loads the combined local state (Parquet snapshot + CSV journal).
+
+    columns optionally projects the read down to a subset of
+    TARGET_COLUMNS; the columnar snapshot then only decodes those column
+    chunks instead of all of them. Rows come back in a stable order
+    (snapshot first, then journal), regardless of projection. Reads are
+    tolerant - a piece that fails to parse is skipped with a warning so
+    the analyzer can still run on whatever state is readable."""
+    wanted = list(columns) if columns is not None else TARGET_COLUMNS
+    frames = []
+    try:
+        if _file_nonempty(LOCAL_STATE_PARQUET):
+            frames.append(pd.read_parquet(LOCAL_STATE_PARQUET, columns=columns))
+    except Exception as e:
+        print(f"Warning: Could not read local state snapshot '{LOCAL_STATE_PARQUET}': {e}")
+    try:
+        if _file_nonempty(LOCAL_STATE_FILE):
+            frames.append(pd.read_csv(LOCAL_STATE_FILE, engine='pyarrow',
+                                      dtype_backend='pyarrow', keep_default_na=False,
+                                      usecols=columns))
+    except pd.errors.EmptyDataError:
+        pass
+    except Exception as e:
+        print(f"Warning: Could not read local state journal '{LOCAL_STATE_FILE}': {e}")
+
+    return _combine_state_frames(frames, wanted)
+
+def compact_local_state():
+    """Folds the CSV journal into the Parquet snapshot atomically.
+
+    Compaction is destructive - it rewrites the snapshot and deletes the
+    journal - so unlike load_local_state's tolerant reads, both pieces
+    are read here with errors raising and the fold only happens once the
+    journal has parsed completely. A journal that doesn't parse (e.g. a
+    final line truncated by a crash mid-append) is quarantined to a
+    '.corrupt' sibling for manual recovery instead of being deleted
+    along with its valid rows; a snapshot read failure aborts the fold
+    with both files left untouched."""
+    if not _file_nonempty(LOCAL_STATE_FILE):
+        return # Nothing journaled since the last compaction
+    try:
+        journal_df = pd.read_csv(LOCAL_STATE_FILE, engine='pyarrow',
+                                 dtype_backend='pyarrow', keep_default_na=False)
+    except Exception as e:
+        print(f"Warning: local state journal '{LOCAL_STATE_FILE}' did not parse cleanly: {e}")
+        quarantine_path = LOCAL_STATE_FILE + '.corrupt'
+        try:
+            os.replace(LOCAL_STATE_FILE, quarantine_path)
+            print(f"Quarantined the journal to '{quarantine_path}'; its rows can be recovered manually.")
+        except OSError as move_e:
+            print(f"Warning: could not quarantine the journal: {move_e}. Leaving it in place.")
+        return
+    try:
+        frames = []
+        if _file_nonempty(LOCAL_STATE_PARQUET):
+            frames.append(pd.read_parquet(LOCAL_STATE_PARQUET))
+        frames.append(journal_df)
+        df = _combine_state_frames(frames, TARGET_COLUMNS)
+        tmp_path = LOCAL_STATE_PARQUET + '.tmp'
+        df.astype(str).to_parquet(tmp_path, compression='zstd', index=False)
+        os.replace(tmp_path, LOCAL_STATE_PARQUET)
+        os.remove(LOCAL_STATE_FILE)
+        print(f"Compacted local state into '{LOCAL_STATE_PARQUET}' ({len(df)} rows).")
+    except Exception as e:
+        print(f"Warning: Could not compact local state into '{LOCAL_STATE_PARQUET}': {e}")
+
+# Token-bucket limiter shared by every rewrite worker. Requests proceed at
+# the configured rate (default matches the old one-request-per-10s pacing)
+# instead of each worker sleeping a fixed delay, so allowed capacity is
+# never left idle when multiple workers run. Rate errors that slip through
+# are still retried by the backoff decorator below.
+gemini_rate_limiter = AsyncLimiter(GEMINI_REQUESTS_PER_MINUTE, time_period=60)
+
 # --- Gemini Rewriting Function --- #
 @backoff.on_exception(backoff.expo, Exception, max_tries=3, jitter=backoff.full_jitter, on_giveup=lambda details: print(f"Gemini API call failed after {details['tries']} tries. Error: {details['exception']}"))
 async def rewrite_text_gemini(original_text, content_type, semaphore):
     """Rewrites the given text into English and Russian using the Gemini API, respecting the semaphore and Rahmet Labs voice."""
+    # Check the local response cache first - on a hit we skip the semaphore
+    # and both API calls entirely.
+    cache_key = gemini_cache_key(original_text, content_type)
+    cached = gemini_cache_get(cache_key)
+    if cached is not None:
+        print(f"  Cache hit for {content_type} (length: {len(original_text)} chars). Skipping Gemini call.")
+        return cached
+
     # Acquire semaphore before proceeding
     async with semaphore:
         print(f"  Semaphore acquired. Rewriting {content_type} (length: {len(original_text)} chars) using Rahmet Labs voice...")
         rewritten_en = "Error: Rewrite Failed (EN)"
         rewritten_ru = "Error: Rewrite Failed (RU)"
 
-        # Refined prompts based on rahmetlabs_character.json
-        prompt_en = f"""Act as the Rahmet Labs AI Copywriter. Your voice is direct, practical, tech-savvy but grounded (no hype), professionally informal, transparent, and confidently focused on tangible outcomes. Analyze the following raw input (notes, tweet, news) and rewrite it into clear, concise, engaging copy reflecting the Rahmet Labs brand. Focus on problem/solution framing and real-world applications. A touch of dry wit or skepticism towards hype is okay. **Format the output for readability using appropriate paragraph breaks.** Ensure the output does not contain any hashtags (#). AVOID: Corporate buzzwords, marketing hype (revolutionary, game-changer, etc.), vague platitudes, overly complex sentences, passive voice. Transform the input into polished, authentic Rahmet Labs communication (e.g., for social media or blog posts):\n\n---\n{original_text}\n---"""
-        prompt_ru = f"""Действуй как AI Копирайтер Rahmet Labs. Твой стиль – прямой, практичный, технически грамотный, но приземленный (без хайпа), профессионально-неформальный, прозрачный и уверенно сфокусированный на ощутимых результатах. Проанализируй следующий необработанный текст (заметки, твит, новость) и перепиши его в ясный, краткий, привлекательный текст, отражающий бренд Rahmet Labs. Сконцентрируйся на формате проблема/решение и реальных применениях. Допускается легкая сухая ирония или скептицизм по отношению к хайпу. **Отформатируй вывод для читабельности, используя соответствующие разрывы абзацев.** Убедись, что в выводе нет хештегов (#). ИЗБЕГАЙ: Корпоративного жаргона, маркетингового хайпа (революционный, меняющий правила игры и т.д.), расплывчатых фраз, излишне сложных предложений, пассивного залога. Преобразуй исходный текст в отполированное, аутентичное сообщение от Rahmet Labs (например, для соцсетей или блога):\n\n---\n{original_text}\n---"""
+        # Static prefix first, dynamic text last - see PROMPT_PREFIX_EN_RU.
+        prompt = PROMPT_PREFIX_EN_RU + str(original_text) + PROMPT_SUFFIX_EN_RU
 
         try:
-            # Run synchronous SDK calls in a separate thread
-            response_en = await asyncio.to_thread(gemini_model.generate_content, prompt_en, request_options={'timeout': 180})
-            rewritten_en = response_en.text.strip() # Added strip()
-            print("    English rewrite generated.")
-
-            # Small delay *inside* semaphore lock if needed to further space calls
-            await asyncio.sleep(1) # Consider if this delay is necessary with semaphore
-
-            response_ru = await asyncio.to_thread(gemini_model.generate_content, prompt_ru, request_options={'timeout': 180})
-            rewritten_ru = response_ru.text.strip() # Added strip() here too
-            print("    Russian rewrite generated.")
+            # Run the synchronous SDK call in a separate thread; one call
+            # returns both languages as JSON.
+            async with gemini_rate_limiter:
+                response = await asyncio.to_thread(
+                    gemini_model.generate_content, prompt,
+                    generation_config={'response_mime_type': 'application/json'},
+                    request_options={'timeout': 180}
+                )
+            parsed = json.loads(response.text)
+            rewritten_en = str(parsed['en']).strip()
+            rewritten_ru = str(parsed['ru']).strip()
+            print("    English and Russian rewrites generated.")
 
         except Exception as e:
             print(f"    ERROR calling Gemini API: {e}")
             raise # Re-raise for backoff
 
+        gemini_cache_set(cache_key, rewritten_en, rewritten_ru)
+
         print(f"  Semaphore released for {content_type} (length: {len(original_text)} chars).")
         return rewritten_en, rewritten_ru
     # Semaphore is automatically released when exiting the 'async with' block
@@ -229,51 +484,71 @@ async def process_data():
     """Reads source data, processes threads, rewrites text saving locally, and syncs to target sheet."""
     print("\n--- Starting Data Processing ---")
     start_time = time.time()
+    # Stamp once per run instead of per row; the value barely changes
+    # across a batch and the tz conversion + strftime are not free.
+    processed_timestamp = datetime.datetime.now(TARGET_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S %Z')
 
     # 1. Read Source Data from Specific Sheets in the single RAW file
+    # All source sheets plus the target state sheet are fetched in ONE
+    # values.batchGet request instead of one HTTPS round-trip per sheet.
     source_sheet_names = [name.strip() for name in SOURCE_SHEET_NAMES_STR.split(',') if name.strip()]
     print(f"Reading data for {PLATFORM} from source sheets: {source_sheet_names}...")
     all_source_dfs = []
     total_source_rows = 0
+    target_state_values = []
 
-    for sheet_name in source_sheet_names:
-        print(f"  Attempting to read sheet: '{sheet_name}'...")
-        try:
-            # Use the single 'sh' object opened earlier
-            worksheet_src = sh.worksheet(sheet_name)
-            data_src = worksheet_src.get_all_values()
+    try:
+        existing_titles = {ws.title for ws in sh.worksheets()}
+        readable_names = []
+        for sheet_name in source_sheet_names:
+            if sheet_name in existing_titles:
+                readable_names.append(sheet_name)
+            else:
+                print(f"  Warning: Source sheet '{sheet_name}' not found. Skipping.")
+
+        # For the target sheet only the URL/EN/RU columns are needed (to
+        # know which URLs are already processed), so fetch just those.
+        state_cols = ['First Tweet URL', 'Rewritten EN', 'Rewritten RU']
+        target_ranges = [f"'{TARGET_SHEET_NAME}'!{_a1_col(c)}:{_a1_col(c)}" for c in state_cols]
+        ranges = [f"'{name}'" for name in readable_names] + target_ranges
+        resp = sh.values_batch_get(ranges)
+        value_ranges = resp.get('valueRanges', [])
+        sheet_values = [vr.get('values', []) for vr in value_ranges]
+        target_state_values = sheet_values[len(readable_names):]
+        sheet_values = sheet_values[:len(readable_names)]
+
+        for sheet_name, data_src in zip(readable_names, sheet_values):
             if len(data_src) < 2:
                 print(f"  Sheet '{sheet_name}' is empty or only contains headers. Skipping.")
                 continue
 
             header = data_src[0]
-            df_sheet = pd.DataFrame(data_src[1:], columns=header)
+            # batchGet trims trailing empty cells, so pad ragged rows back out
+            # Declare the dtype at construction - everything from the values
+            # API is a string already, so no separate conversion pass is needed
+            padded_rows = [row + [''] * (len(header) - len(row)) for row in data_src[1:]]
+            df_sheet = pd.DataFrame(padded_rows, columns=header, dtype='string')
 
             # Standardization: Add missing columns from TARGET_COLUMNS, keep existing ones
             current_cols = df_sheet.columns.tolist()
-            added_cols = False
             for col in TARGET_COLUMNS:
                 if col not in current_cols:
                     df_sheet[col] = '' # Add missing target columns
-                    added_cols = True
-            
+
             # No need to explicitly select columns here, keep all read + added target ones
 
             all_source_dfs.append(df_sheet)
             print(f"  Read {len(df_sheet)} rows from sheet '{sheet_name}'. Added missing target columns.")
             total_source_rows += len(df_sheet)
 
-        except gspread.exceptions.WorksheetNotFound:
-            print(f"  Warning: Source sheet '{sheet_name}' not found. Skipping.")
-        except Exception as e:
-            error_msg = f"  ERROR reading data from source sheet '{sheet_name}': {e}"
-            print(error_msg)
-            send_telegram_notification(f"🚨 {error_msg}")
-            # Decide if we should continue or exit? For now, continue with other sheets.
+    except Exception as e:
+        error_msg = f"  ERROR batch-reading source sheets: {e}"
+        print(error_msg)
+        await send_telegram_notification_async(f"🚨 {error_msg}")
 
     if not all_source_dfs:
         print("No data read from any source sheets. Exiting.")
-        send_telegram_notification("ℹ️ Analyzer run finished: No source data found.")
+        await send_telegram_notification_async("ℹ️ Analyzer run finished: No source data found.")
         return
 
     # Concatenate source dataframes
@@ -281,62 +556,42 @@ async def process_data():
     print(f"Combined data for {PLATFORM}. Total rows: {len(df_src)}")
 
     # 1b. Load Platform-Specific Local State
-    print(f"Attempting to load local state from '{LOCAL_STATE_FILE}'...")
-    df_local_state = None
-    processed_urls_local = set()
-    try:
-        if os.path.exists(LOCAL_STATE_FILE) and os.path.getsize(LOCAL_STATE_FILE) > 0:
-             dtypes = {col: str for col in TARGET_COLUMNS}
-             df_local_state = pd.read_csv(LOCAL_STATE_FILE, dtype=dtypes, keep_default_na=False, na_values=[''])
-             df_local_state = df_local_state.fillna('')
-             # Ensure all TARGET_COLUMNS exist after load
-             for col in TARGET_COLUMNS:
-                  if col not in df_local_state.columns:
-                       df_local_state[col] = ''
-             df_local_state = df_local_state[TARGET_COLUMNS] # Reorder/select
-             processed_urls_local = load_processed_urls(df_local_state)
-             print(f"Loaded {len(df_local_state)} rows from local state. Found {len(processed_urls_local)} successfully processed URLs.")
-        else:
-            print("Local state file not found or empty.")
-            df_local_state = pd.DataFrame(columns=TARGET_COLUMNS)
-            processed_urls_local = set()
-    except pd.errors.EmptyDataError:
-         print("Local state file is empty.")
-         df_local_state = pd.DataFrame(columns=TARGET_COLUMNS)
-         processed_urls_local = set()
-    except Exception as e:
-        print(f"Warning: Could not read or parse local state file '{LOCAL_STATE_FILE}': {e}. Proceeding without local state.")
-        # Ensure df_local_state is an empty DataFrame for consistency
-        df_local_state = pd.DataFrame(columns=TARGET_COLUMNS)
-        processed_urls_local = set()
+    print(f"Attempting to load local state from '{LOCAL_STATE_PARQUET}' (+ journal '{LOCAL_STATE_FILE}')...")
+    df_local_state = load_local_state()
+    processed_urls_local = load_processed_urls(
+        df_local_state['First Tweet URL'], df_local_state['Rewritten EN'], df_local_state['Rewritten RU'])
+    if df_local_state.empty:
+        print("No local state found.")
+    else:
+        print(f"Loaded {len(df_local_state)} rows from local state. Found {len(processed_urls_local)} successfully processed URLs.")
 
     # 1c. Read Platform-Specific Target Google Sheet State
+    # Uses the URL/EN/RU columns already fetched in the batchGet above -
+    # no need to build the full 20-column frame just to collect URLs.
     print(f"Reading existing data from target sheet '{TARGET_SHEET_NAME}'...")
-    df_gsheet_state = None
     processed_urls_gsheet = set()
     try:
-        data_tgt = worksheet_tgt.get_all_values()
-        if len(data_tgt) >= 2:
-            header_tgt = data_tgt[0]
-            df_gsheet_state = pd.DataFrame(data_tgt[1:], columns=header_tgt).astype(str)
-            df_gsheet_state = df_gsheet_state.fillna('')
-            # Ensure all TARGET_COLUMNS exist
-            for col in TARGET_COLUMNS:
-                 if col not in df_gsheet_state.columns:
-                      df_gsheet_state[col] = ''
-            df_gsheet_state = df_gsheet_state[TARGET_COLUMNS]
-            processed_urls_gsheet = load_processed_urls(df_gsheet_state)
+        cols = [[row[0] if row else '' for row in values] for values in target_state_values]
+        max_rows = max((len(c) for c in cols), default=0)
+        if max_rows >= 2:
+            # Skip the header row; pad the shorter columns so the three
+            # Series stay row-aligned.
+            urls_col, en_col, ru_col = (
+                pd.Series(c[1:] + [''] * (max_rows - len(c))) for c in cols)
+            processed_urls_gsheet = load_processed_urls(urls_col, en_col, ru_col)
             print(f"Found {len(processed_urls_gsheet)} successfully processed URLs in target sheet.")
         else:
             print("Target sheet is empty or has no data rows.")
-            df_gsheet_state = pd.DataFrame(columns=TARGET_COLUMNS)
-            processed_urls_gsheet = set()
     except Exception as e:
         print(f"Warning: Could not read or parse target sheet '{TARGET_SHEET_NAME}': {e}.")
 
     # 1d. Combine Processed URLs
     processed_urls = processed_urls_local.union(processed_urls_gsheet)
     print(f"Total unique processed URLs from local and GSheet: {len(processed_urls)}")
+    # Dedup membership runs on 64-bit hashes instead of raw URL strings;
+    # uint64 comparisons are far cheaper than re-hashing long strings and
+    # the array is a fraction of the size of a Python set of URLs.
+    processed_url_hashes = pd.util.hash_array(np.array(list(processed_urls), dtype=object))
 
     # 2. Pre-process Combined Source Data
     print("Pre-processing combined source data...")
@@ -362,114 +617,89 @@ async def process_data():
         # Ensure Tweet Text is string
         df_src['Tweet Text'] = df_src['Tweet Text'].astype(str)
 
+        # Group keys are low-cardinality strings; categorical codes turn the
+        # groupby/comparisons into integer ops and store each distinct value
+        # once instead of one Python string object per row.
+        df_src['Original Username'] = df_src['Original Username'].astype('category')
+        df_src['Conversation ID'] = df_src['Conversation ID'].astype('category')
+
     except Exception as e:
         error_msg = f"ERROR during data pre-processing: {e}"
         print(error_msg)
         import traceback
         tb_str = traceback.format_exc()
-        send_telegram_notification(f"🚨 {error_msg}\n```\n{tb_str[:1000]}\n```")
+        await send_telegram_notification_async(f"🚨 {error_msg}\n```\n{tb_str[:1000]}\n```")
         return
 
     # 3. Identify and Consolidate Threads
     print("Identifying and consolidating threads (filtering replies to others)...")
-    processed_rows = []
     # Ensure columns needed for grouping exist before grouping
     grouping_cols = ['Original Username', 'Conversation ID']
     if not all(col in df_src.columns for col in grouping_cols):
         missing_group_cols = [col for col in grouping_cols if col not in df_src.columns]
         print(f"ERROR: Cannot group data, missing columns: {missing_group_cols}")
         return
-    grouped = df_src.groupby(grouping_cols)
-
-    for name, group in grouped:
-        username, conv_id = name
-        group = group.sort_values(by='First Tweet Timestamp') # Ensure sorted within group
-        author_username = username # Get the author username for this group
-
-        # Filter out tweets that are clearly replies starting with @other_user
-        # Regex: ^\s* : start of string, optional whitespace
-        # @ : literal @
-        # (?!(?:{re.escape(author_username)}\b)) : negative lookahead - username is NOT the author's own username (case-insensitive later)
-        # (?:...) : non-capturing group
-        # \b : word boundary to avoid partial matches
-        # [\w]{1,15} : matches a valid Twitter username (1-15 alphanumeric chars + _)
-        # Match case-insensitively
-        reply_to_other_pattern = rf'^\s*@(?!(?:{re.escape(author_username)}\b))([\w]{{1,15}})'
-        core_thread_tweets = group[~group['Tweet Text'].str.contains(reply_to_other_pattern, case=False, na=False, regex=True)].copy()
-
-        if core_thread_tweets.empty:
-            # This conversation by the user consisted ONLY of replies to others, skip.
-            # print(f"  Skipping group {name} - only replies to others.") # Optional verbose log
-            continue
-
-        # Determine if it's a thread based on remaining tweets
-        is_thread = len(core_thread_tweets) > 1
-
-        if is_thread:
-            first_tweet = core_thread_tweets.iloc[0]
-            # Combine text ONLY from the core thread tweets
-            combined_text = "\n\n---\n\n".join(core_thread_tweets['Tweet Text'].astype(str))
-            processed_row = {
-                "Processed Timestamp": datetime.datetime.now(TARGET_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S %Z'),
-                "Original Username": first_tweet['Original Username'],
-                "Original Display Name": first_tweet['Display Name'],
-                "First Tweet Timestamp": first_tweet['First Tweet Timestamp'],
-                "Combined Original Text": combined_text,
-                "First Tweet URL": first_tweet['First Tweet URL'],
-                "Likes (First Tweet)": first_tweet['Likes (First Tweet)'],
-                "Retweets (First Tweet)": first_tweet['Retweets (First Tweet)'],
-                "Replies (First Tweet)": first_tweet['Replies (First Tweet)'],
-                "Quotes (First Tweet)": first_tweet['Quotes (First Tweet)'],
-                "Bookmarks (First Tweet)": first_tweet['Bookmarks (First Tweet)'],
-                "Views (First Tweet)": first_tweet['Views (First Tweet)'],
-                "Content Type": "Thread", # Mark as Thread
-                "Conversation ID": conv_id,
-                "Rewritten EN": "",
-                "Rewritten RU": "",
-                "Source Row Count": len(core_thread_tweets), # Count only core tweets
-                "Platform": PLATFORM,
-                "Subreddit": "",
-                "Score": "",
-                "Num Comments": "",
-                "Post ID": ""
-            }
-            processed_rows.append(processed_row)
-        else:
-            # Only one tweet left after filtering, treat as single
-            single_tweet = core_thread_tweets.iloc[0]
-            processed_row = {
-                "Processed Timestamp": datetime.datetime.now(TARGET_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S %Z'),
-                "Original Username": single_tweet['Original Username'],
-                "Original Display Name": single_tweet['Display Name'],
-                "First Tweet Timestamp": single_tweet['First Tweet Timestamp'],
-                "Combined Original Text": single_tweet['Tweet Text'],
-                "First Tweet URL": single_tweet['First Tweet URL'],
-                "Likes (First Tweet)": single_tweet['Likes (First Tweet)'],
-                "Retweets (First Tweet)": single_tweet['Retweets (First Tweet)'],
-                "Replies (First Tweet)": single_tweet['Replies (First Tweet)'],
-                "Quotes (First Tweet)": single_tweet['Quotes (First Tweet)'],
-                "Bookmarks (First Tweet)": single_tweet['Bookmarks (First Tweet)'],
-                "Views (First Tweet)": single_tweet['Views (First Tweet)'],
-                "Content Type": single_tweet['Tweet Type'], # Use original type
-                "Conversation ID": conv_id,
-                "Rewritten EN": "",
-                "Rewritten RU": "",
-                "Source Row Count": 1,
-                "Platform": PLATFORM,
-                "Subreddit": "",
-                "Score": "",
-                "Num Comments": "",
-                "Post ID": ""
-            }
-            processed_rows.append(processed_row)
-
-    if not processed_rows:
+
+    # Filter out tweets that are clearly replies starting with @other_user.
+    # One vectorized extract over the whole column replaces the per-group
+    # f-string regex: pull the leading @mention (valid Twitter usernames are
+    # 1-15 word chars) and drop rows where it names someone other than the
+    # author. Comparison is case-insensitive.
+    first_mention = df_src['Tweet Text'].str.extract(r'^\s*@(\w{1,15})', expand=False).str.lower()
+    is_reply_to_other = first_mention.notna() & (first_mention != df_src['Original Username'].astype(str).str.lower())
+    replies_to_others = int(is_reply_to_other.sum())
+    if replies_to_others:
+        print(f"  Filtered out {replies_to_others} replies to other users before grouping.")
+    df_src = df_src[~is_reply_to_other]
+
+    # Sort once so 'first' aggregations pick the earliest tweet of each
+    # conversation and thread text is joined in chronological order.
+    df_src = df_src.sort_values(['Original Username', 'Conversation ID', 'First Tweet Timestamp'],
+                                kind='mergesort')
+
+    # Consolidate each (user, conversation) group in one vectorized agg
+    # instead of building per-group Python dicts. sort=False reuses the
+    # sort above; observed=True keeps categorical keys from reindexing to
+    # the full category product.
+    gb = df_src.groupby(grouping_cols, sort=False, observed=True, as_index=False)
+    df_consolidated = gb.agg({
+        'Tweet Text': lambda s: '\n\n---\n\n'.join(s),
+        'Display Name': 'first',
+        'First Tweet Timestamp': 'first',
+        'First Tweet URL': 'first',
+        'Likes (First Tweet)': 'first',
+        'Retweets (First Tweet)': 'first',
+        'Replies (First Tweet)': 'first',
+        'Quotes (First Tweet)': 'first',
+        'Bookmarks (First Tweet)': 'first',
+        'Views (First Tweet)': 'first',
+        'Tweet Type': 'first',
+    })
+    df_consolidated['Source Row Count'] = gb.size()['size'].to_numpy()
+    df_consolidated = df_consolidated.rename(columns={
+        'Tweet Text': 'Combined Original Text',
+        'Display Name': 'Original Display Name',
+    })
+
+    # Multi-tweet conversations are threads; singles keep their source type
+    df_consolidated['Content Type'] = np.where(
+        df_consolidated['Source Row Count'] > 1, 'Thread', df_consolidated['Tweet Type'])
+    df_consolidated = df_consolidated.drop(columns=['Tweet Type'])
+    df_consolidated['Processed Timestamp'] = processed_timestamp
+    df_consolidated['Rewritten EN'] = ''
+    df_consolidated['Rewritten RU'] = ''
+    df_consolidated['Platform'] = PLATFORM
+    # Same treatment for the low-cardinality consolidated columns; isin on
+    # a categorical is a code lookup rather than a string hash per row.
+    for col in ['Platform', 'Content Type']:
+        df_consolidated[col] = df_consolidated[col].astype('category')
+
+    if df_consolidated.empty:
         print("No processable data found after grouping source data.")
         # Run final sync in case local state needs uploading
         await sync_local_to_gsheet(worksheet_tgt)
         return
 
-    df_consolidated = pd.DataFrame(processed_rows)
     # Ensure df_consolidated has all TARGET_COLUMNS before proceeding
     for col in TARGET_COLUMNS:
         if col not in df_consolidated.columns:
@@ -480,18 +710,10 @@ async def process_data():
     # 3a. Parse Timestamps and Sort Consolidated Data
     print("Parsing timestamps and sorting consolidated data...")
     try:
-        # Define parsing function here (or keep globally if preferred)
-        def parse_datetime(ts_str):
-            try:
-                return pd.to_datetime(ts_str)
-            except Exception:
-                 try:
-                     return pd.to_datetime(ts_str.split(' ')[0] + ' ' + ts_str.split(' ')[1])
-                 except Exception:
-                     return pd.NaT
-
-        # Apply parsing to the correct column
-        df_consolidated['First Tweet Timestamp DT'] = df_consolidated['First Tweet Timestamp'].apply(parse_datetime)
+        # One vectorized pass; unparseable values coerce to NaT and are
+        # dropped below, matching the old per-row try/except behaviour.
+        df_consolidated['First Tweet Timestamp DT'] = pd.to_datetime(
+            df_consolidated['First Tweet Timestamp'], errors='coerce', utc=True, format='mixed')
 
         # Drop rows where timestamp parsing failed
         rows_before_sort = len(df_consolidated)
@@ -509,207 +731,276 @@ async def process_data():
         # ... [error handling] ...
         return
 
-    # 3b. Filter out already processed items
-    # Uses 'First Tweet URL' which should be present from standardization/consolidation
-    df_to_process = df_consolidated[~df_consolidated['First Tweet URL'].isin(processed_urls)].copy()
-    print(f"Filtered down to {len(df_to_process)} new items to process.")
-
-    # 3c. Filter by Content Type before rewriting
-    print(f"Filtering {len(df_to_process)} items based on platform-specific content types...")
+    # 3b/3c. Filter out already processed items and unwanted content types.
+    # Both masks are computed on df_consolidated and combined up front so
+    # the frame is sliced (and copied) once instead of per filter stage.
     if PLATFORM == 'twitter':
         content_types_to_rewrite = ['Original Tweet', 'Thread']
     elif PLATFORM == 'reddit':
         # Assuming the reddit scraper sets Tweet Type to 'Reddit Post'
-        content_types_to_rewrite = ['Reddit Post'] 
+        content_types_to_rewrite = ['Reddit Post']
     else:
         content_types_to_rewrite = [] # Should not happen
 
-    df_typed_filtered = df_to_process[df_to_process['Content Type'].isin(content_types_to_rewrite)].copy()
+    consolidated_url_hashes = pd.util.hash_array(
+        df_consolidated['First Tweet URL'].astype(str).to_numpy())
+    new_mask = ~np.isin(consolidated_url_hashes, processed_url_hashes)
+    print(f"Filtered down to {int(new_mask.sum())} new items to process.")
+    type_mask = df_consolidated['Content Type'].isin(content_types_to_rewrite).to_numpy()
+
+    df_typed_filtered = df_consolidated.loc[new_mask & type_mask]
     print(f"Filtered down to {len(df_typed_filtered)} items matching desired content types: {content_types_to_rewrite}")
 
     if df_typed_filtered.empty:
         print("No new items match the desired content types (Original Tweet, Thread).")
         await sync_local_to_gsheet(worksheet_tgt) # Still sync in case local needs upload
-        send_telegram_notification("ℹ️ Analyzer run finished: No new Original Tweets or Threads found.")
+        await send_telegram_notification_async("ℹ️ Analyzer run finished: No new Original Tweets or Threads found.")
         return
 
     # 3d. Apply Additional Content Filters (Length, Relevance Keywords)
     print(f"Applying additional content filters to {len(df_typed_filtered)} items...")
 
     MIN_CONTENT_LENGTH = 50 # Minimum characters excluding URLs/separators
-    RELEVANT_KEYWORDS = [
-        'ai', 'agi', 'openai', 'google', 'gemini', 'claude', 'mistral', 'llm',
-        'model', 'automation', ' n8n', 'python', 'api', 'workflow', 'data',
-        'tech', 'business', 'startup', 'rahmetlabs', 'scraping', 'analyze',
-        'process', 'update', 'news', 'release', 'research', 'paper', 'opinion',
-        'thought', 'develop', 'build', 'future', 'risk', 'safety', 'alignment',
-        'code', 'coding', 'launch', 'feature', 'limit', 'rate limit', 'context window',
-        'token', 'prompt', 'engineer', 'benchmark', 'test'
-    ] # Expanded keyword list
-
-    # Helper to clean text for length/relevance check
-    def clean_text_for_filtering(text):
-        text = str(text)
-        # Remove URLs
-        text = re.sub(r'http\S+|www.\S+', '', text)
-        # Remove potential --- separators
-        text = text.replace('---', '')
-        # Remove extra whitespace
-        text = ' '.join(text.split())
-        return text.strip()
-
-    # Apply cleaning
-    df_typed_filtered['Cleaned Text'] = df_typed_filtered['Combined Original Text'].apply(clean_text_for_filtering)
-
-    # Apply Length Filter
-    df_length_filtered = df_typed_filtered[df_typed_filtered['Cleaned Text'].str.len() >= MIN_CONTENT_LENGTH].copy()
-    removed_by_length = len(df_typed_filtered) - len(df_length_filtered)
+
+    # Clean text for the length/relevance check: strip URLs, the ---
+    # thread separators, and collapse whitespace. Vectorized .str ops run
+    # one compiled pass per step instead of a Python call per row.
+    cleaned = (df_typed_filtered['Combined Original Text'].astype('string')
+               .str.replace(r'http\S+|www.\S+', '', regex=True)
+               .str.replace('---', '', regex=False)
+               .str.replace(r'\s+', ' ', regex=True)
+               .str.strip())
+
+    # Filters run cheapest-first so each regex scan only touches rows that
+    # survived the cheaper checks: the length gate and the literal backtick
+    # count feed the keyword scan, which in turn feeds the prompt-marker
+    # scan. Everything stays index-aligned boolean masks - the frame itself
+    # is still sliced exactly once at the end.
+    text = df_typed_filtered['Combined Original Text']
+    length_mask = cleaned.str.len() >= MIN_CONTENT_LENGTH
+    backtick_mask = text.str.count('```') <= 2 # Allow zero or one code block
+    cheap_survivors = text[length_mask & backtick_mask]
+    keyword_mask = cheap_survivors.str.contains(KEYWORD_RE, na=False)
+    keyword_survivors = cheap_survivors[keyword_mask]
+    prompt_mask = ~keyword_survivors.str.contains(PROMPT_RE, na=False)
+
+    removed_by_length = int((~length_mask).sum())
     if removed_by_length > 0:
         print(f"  {removed_by_length} items removed by length filter (<{MIN_CONTENT_LENGTH} chars).")
-
-    # Apply Keyword Filter
-    keyword_pattern = '|'.join([re.escape(k) for k in RELEVANT_KEYWORDS]) # Escape keywords for regex
-    df_final_filtered = df_length_filtered[df_length_filtered['Combined Original Text'].str.contains(keyword_pattern, case=False, na=False)].copy()
-    removed_by_keyword = len(df_length_filtered) - len(df_final_filtered)
+    removed_by_keyword = int((~keyword_mask).sum())
     if removed_by_keyword > 0:
         print(f"  {removed_by_keyword} items removed by keyword filter.")
-
-    # Apply Prompt/Structure Filter (New)
-    prompt_markers = ['# Prompt', '<Role>', '<Instructions>', '<Context>']
-    prompt_pattern = '|'.join([re.escape(m) for m in prompt_markers])
-    # Also check for more than one code block as an indicator
-    df_pre_prompt_filter = df_final_filtered.copy() # Keep track before this filter
-    df_final_filtered = df_final_filtered[
-        ~df_final_filtered['Combined Original Text'].str.contains(prompt_pattern, case=False, na=False) &
-        (df_final_filtered['Combined Original Text'].str.count('```') <= 2) # Allow zero or one code block
-    ].copy()
-    removed_by_prompt_filter = len(df_pre_prompt_filter) - len(df_final_filtered)
+    removed_by_prompt_filter = int((length_mask & ~backtick_mask).sum()) + int((~prompt_mask).sum())
     if removed_by_prompt_filter > 0:
         print(f"  {removed_by_prompt_filter} items removed by prompt structure filter.")
 
-    # Clean up temporary column
-    # df_final_filtered = df_final_filtered.drop(columns=['Cleaned Text']) # Removed earlier, ensure no error if run again
-    if 'Cleaned Text' in df_final_filtered.columns:
-         df_final_filtered = df_final_filtered.drop(columns=['Cleaned Text'])
+    df_final_filtered = df_typed_filtered.loc[prompt_mask.index[prompt_mask]]
 
     print(f"Filtered down to {len(df_final_filtered)} items meeting all criteria.")
 
     if df_final_filtered.empty:
         print("No new items match all filtering criteria. Nothing to rewrite.")
         await sync_local_to_gsheet(worksheet_tgt)
-        send_telegram_notification("ℹ️ Analyzer run finished: No new relevant Original Tweets or Threads to process.")
+        await send_telegram_notification_async("ℹ️ Analyzer run finished: No new relevant Original Tweets or Threads to process.")
         return
 
     # 4. Rewrite Text & Save Incrementally to Platform-Specific Local CSV
-    print(f"Rewriting text for {len(df_final_filtered)} filtered items sequentially and saving to '{LOCAL_STATE_FILE}'...")
+    # Producer/consumer pipeline: a bounded queue feeds a fixed pool of
+    # worker tasks, so at most O(concurrency) items are in flight at once
+    # (instead of creating every task up front) and completed rows are
+    # flushed to the journal in small batches as they finish.
+    print(f"Rewriting text for {len(df_final_filtered)} filtered items with {GEMINI_CONCURRENT_REQUESTS} worker(s), saving to '{LOCAL_STATE_FILE}'...")
     semaphore = asyncio.Semaphore(GEMINI_CONCURRENT_REQUESTS)
-    POST_REWRITE_DELAY_SECONDS = 10.0
+    FLUSH_EVERY_N_ROWS = 16
     processed_count = 0
     failed_count = 0
+    items_done = 0
     total_rows_to_rewrite = len(df_final_filtered)
-    headers_written = os.path.exists(LOCAL_STATE_FILE) and os.path.getsize(LOCAL_STATE_FILE) > 0
-
-    # Open local state file in append mode
-    with open(LOCAL_STATE_FILE, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=TARGET_COLUMNS)
+    headers_written = _file_nonempty(LOCAL_STATE_FILE)
+
+    rewrite_queue = asyncio.Queue(maxsize=GEMINI_CONCURRENT_REQUESTS * 2)
+    pending_rows = []
+    # Every row completed this run, kept in memory so the final sync can
+    # upload them directly instead of re-parsing the files just written.
+    completed_rows = []
+
+    # Project down to the columns that actually get serialized before the
+    # records conversion - the working 'First Tweet Timestamp DT' column
+    # added for sorting would otherwise ride along into every row dict.
+    df_final_filtered = df_final_filtered[TARGET_COLUMNS]
+
+    # Convert to plain dicts once up front: iterrows() builds a full Series
+    # per row (dtype boxing included) and the frame is only used as a row
+    # container from here on. Keep the original index for log messages.
+    # The emptiness check is vectorized here too, so the hot loop reads a
+    # precomputed bool instead of calling pd.isna/str.strip per row.
+    empty_mask = (df_final_filtered['Combined Original Text']
+                  .fillna('').astype(str).str.strip().eq('').to_numpy())
+    records = list(zip(df_final_filtered.index, empty_mask.tolist(),
+                       df_final_filtered.to_dict('records')))
+
+    # Open local state file in append mode with a 1 MiB buffer: bytes only
+    # hit the OS on the explicit flush every FLUSH_EVERY_N_ROWS rows (or at
+    # shutdown), not as a small write syscall per row.
+    with open(LOCAL_STATE_FILE, 'a', buffering=1 << 20, newline='', encoding='utf-8') as f:
+        # Positional writer: rows are pre-ordered lists, so there's no
+        # per-row fieldname lookup machinery like DictWriter's.
+        writer = csv.writer(f)
         # Write header only if the file is new/empty
-        # Check if headers need to be written (only once per complete run where items are processed)
-        needs_header = not headers_written
-
-        for index, row in df_final_filtered.iterrows(): # Iterate over final filtered DataFrame
-            # Write header on the very first iteration if needed
-            if needs_header:
-                 writer.writeheader()
-                 headers_written = True
-                 needs_header = False # Prevent writing header again
-
-            current_item_num = processed_count + failed_count + 1
-            print(f"\nProcessing item {current_item_num}/{total_rows_to_rewrite} (Source Index: {index})...")
-            original_text = row['Combined Original Text']
-            content_type = row['Content Type']
-            rewritten_en = "Error: Skipped"
-            rewritten_ru = "Error: Skipped"
-
-            # Prepare base row data from the consolidated row
-            result_row = row.to_dict()
-
-            if pd.isna(original_text) or not str(original_text).strip():
-                print(f"  Skipping item {current_item_num} due to empty original text.")
-                result_row['Rewritten EN'] = "Error: Empty Source Text"
-                result_row['Rewritten RU'] = "Error: Empty Source Text"
-                failed_count += 1
-            else:
-                try:
-                    en_text, ru_text = await rewrite_text_gemini(str(original_text), content_type, semaphore)
-                    result_row['Rewritten EN'] = en_text
-                    result_row['Rewritten RU'] = ru_text
-                    processed_count += 1
-                except Exception as e:
-                    print(f"  Rewrite failed for item {current_item_num}: {e}")
-                    result_row['Rewritten EN'] = "Error: Rewrite Failed (EN)"
-                    result_row['Rewritten RU'] = "Error: Rewrite Failed (RU)"
-                    failed_count += 1
-
-            # Ensure all target columns are present before writing
-            final_row_for_csv = {col: result_row.get(col, '') for col in TARGET_COLUMNS}
-
-            # Write the processed row immediately to local CSV
+        if not headers_written:
+            writer.writerow(TARGET_COLUMNS)
+
+        def flush_pending():
+            if not pending_rows:
+                return
             try:
-                writer.writerow(final_row_for_csv)
-                print(f"  Saved item {current_item_num} to '{LOCAL_STATE_FILE}'.")
+                writer.writerows(pending_rows)
+                f.flush()
+                print(f"  Flushed {len(pending_rows)} row(s) to '{LOCAL_STATE_FILE}'.")
             except Exception as write_e:
-                 print(f"  ERROR writing item {current_item_num} to local CSV: {write_e}")
-                 # Optional: Add more robust error handling here if needed
+                print(f"  ERROR writing rows to local CSV: {write_e}")
+            pending_rows.clear()
 
-            # Delay before next item
-            if current_item_num < total_rows_to_rewrite:
-                print(f"  Waiting {POST_REWRITE_DELAY_SECONDS}s before next item...")
-                await asyncio.sleep(POST_REWRITE_DELAY_SECONDS)
+        async def rewrite_worker():
+            nonlocal processed_count, failed_count, items_done
+            while True:
+                index, is_empty, row = await rewrite_queue.get()
+                try:
+                    original_text = row['Combined Original Text']
+                    content_type = row['Content Type']
+
+                    # Prepare base row data from the consolidated row
+                    result_row = dict(row)
+
+                    if is_empty:
+                        print(f"  Skipping item (Source Index: {index}) due to empty original text.")
+                        result_row['Rewritten EN'] = "Error: Empty Source Text"
+                        result_row['Rewritten RU'] = "Error: Empty Source Text"
+                        failed_count += 1
+                    else:
+                        try:
+                            en_text, ru_text = await rewrite_text_gemini(str(original_text), content_type, semaphore)
+                            result_row['Rewritten EN'] = en_text
+                            result_row['Rewritten RU'] = ru_text
+                            processed_count += 1
+                        except Exception as e:
+                            print(f"  Rewrite failed for item (Source Index: {index}): {e}")
+                            result_row['Rewritten EN'] = "Error: Rewrite Failed (EN)"
+                            result_row['Rewritten RU'] = "Error: Rewrite Failed (RU)"
+                            failed_count += 1
+
+                    # Order values to TARGET_COLUMNS; missing columns become ''
+                    ordered_row = [result_row.get(col, '') for col in TARGET_COLUMNS]
+                    pending_rows.append(ordered_row)
+                    completed_rows.append(ordered_row)
+                    items_done += 1
+                    print(f"  Completed item {items_done}/{total_rows_to_rewrite} (Source Index: {index}).")
+                    if len(pending_rows) >= FLUSH_EVERY_N_ROWS:
+                        flush_pending()
+                finally:
+                    rewrite_queue.task_done()
+
+        workers = [asyncio.create_task(rewrite_worker()) for _ in range(GEMINI_CONCURRENT_REQUESTS)]
+        try:
+            for item in records:
+                await rewrite_queue.put(item) # Blocks when the queue is full
+            await rewrite_queue.join()
+        finally:
+            for worker_task in workers:
+                worker_task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            flush_pending()
 
     print(f"\nFinished processing loop: {processed_count} successful, {failed_count} failed and saved locally.")
 
-    # 5. Final Sync: Upload missing rows from Local State to Platform-Specific Target Google Sheet
-    await sync_local_to_gsheet(worksheet_tgt) # Pass worksheet object
+    # Fold this run's journaled rows into the Parquet snapshot
+    compact_local_state()
+
+    # 5. Final Sync: Upload this run's completed rows (still in memory) to
+    # the Platform-Specific Target Google Sheet
+    await sync_local_to_gsheet(worksheet_tgt, local_rows=completed_rows)
 
     end_time = time.time()
     duration = end_time - start_time
     success_msg = f"✅ Analyzer finished successfully in {duration:.2f}s. Processed {processed_count} new items. Check '{TARGET_SHEET_NAME}' for synced data."
     print(success_msg)
-    send_telegram_notification(success_msg)
+    await send_telegram_notification_async(success_msg)
 
-async def sync_local_to_gsheet(worksheet_tgt):
-    """Reads local state and uploads rows missing from the target Google Sheet."""
+async def sync_local_to_gsheet(worksheet_tgt, local_rows=None):
+    """Uploads local-state rows missing from the target Google Sheet.
+
+    When local_rows (this run's completed rows, already journaled) is
+    passed, those are the upload candidates directly - no point
+    re-parsing state files written moments ago. Rows stranded by an
+    earlier failed sync are swept up by any caller that passes no rows
+    (the nothing-new paths), which performs the full state-file diff and
+    refreshes the synced-URL digest."""
     print(f"\n--- Starting Final Sync to Google Sheet '{worksheet_tgt.title}' ---")
 
-    # Read definitive local state
-    print(f"Reading local state from '{LOCAL_STATE_FILE}' for final sync...")
     df_local_final = None
-    try:
-        if os.path.exists(LOCAL_STATE_FILE) and os.path.getsize(LOCAL_STATE_FILE) > 0:
-             dtypes = {col: str for col in TARGET_COLUMNS}
-             df_local_final = pd.read_csv(LOCAL_STATE_FILE, dtype=dtypes, keep_default_na=False, na_values=[''])
-             df_local_final = df_local_final.fillna('')
-             print(f"Read {len(df_local_final)} rows from final local state.")
-        else:
-            print("Local state file not found or empty. Nothing to sync.")
+    current_url_hash = None
+    url_hash_file = LOCAL_STATE_FILE + '.urlhash'
+
+    if local_rows is not None:
+        if not local_rows:
+            print("No rows completed this run. Nothing to sync.")
+            return
+        df_local_final = pd.DataFrame(local_rows, columns=TARGET_COLUMNS)
+        local_urls = df_local_final['First Tweet URL'].astype(str)
+        print(f"Syncing {len(local_urls)} rows completed by this run (no state re-read).")
+    else:
+        # Read only the URL column of the local state for the diff; the
+        # full rows are materialized further down, and only when there is
+        # actually something to upload.
+        print(f"Reading local state URLs from '{LOCAL_STATE_PARQUET}' for final sync...")
+        try:
+            local_urls = load_local_state(columns=['First Tweet URL'])['First Tweet URL'].astype(str)
+            if local_urls.empty:
+                print("Local state not found or empty. Nothing to sync.")
+                return
+            print(f"Read {len(local_urls)} rows from final local state.")
+        except Exception as e:
+            print(f"ERROR reading final local state: {e}. Sync aborted.")
+            await send_telegram_notification_async(f"🚨 ERROR reading local state for final sync: {e}")
             return
-    except Exception as e:
-        print(f"ERROR reading final local state file '{LOCAL_STATE_FILE}': {e}. Sync aborted.")
-        send_telegram_notification(f"🚨 ERROR reading local state file for final sync: {e}")
-        return
 
-    # Read current Google Sheet state
-    print("Reading current Google Sheet state for comparison...")
-    df_gsheet_current = None
+        # Cheap no-op detector: a digest of the sorted local URL set is
+        # stored after every successful full sync. When the digest hasn't
+        # moved, nothing new can exist locally, so skip the sheet read and
+        # diff entirely.
+        current_url_hash = hashlib.blake2b(
+            '\n'.join(sorted(local_urls)).encode('utf-8')
+        ).hexdigest()
+        try:
+            with open(url_hash_file, 'r', encoding='utf-8') as hf:
+                if hf.read().strip() == current_url_hash:
+                    print("Local URL set unchanged since last successful sync. Nothing to upload.")
+                    return
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Warning: Could not read sync hash file '{url_hash_file}': {e}")
+
+    def record_synced_hash():
+        # Only recorded for full-state diffs: the in-memory fast path never
+        # sees the complete local URL set, so it leaves the digest stale
+        # and the next full diff refreshes it.
+        if current_url_hash is None:
+            return
+        try:
+            with open(url_hash_file, 'w', encoding='utf-8') as hf:
+                hf.write(current_url_hash)
+        except Exception as e:
+            print(f"Warning: Could not write sync hash file '{url_hash_file}': {e}")
+
+    # Read current Google Sheet state - only the URL column is needed for
+    # the diff, so fetch just that instead of downloading the whole sheet.
+    print("Reading current Google Sheet URL column for comparison...")
     processed_urls_gsheet_current = set()
     try:
-        data_tgt = worksheet_tgt.get_all_values()
-        if len(data_tgt) >= 2:
-            df_gsheet_current = pd.DataFrame(data_tgt[1:], columns=data_tgt[0]).astype(str)
-            df_gsheet_current = df_gsheet_current.fillna('')
-            # Use the same helper, but only need URLs this time
-            if 'First Tweet URL' in df_gsheet_current.columns:
-                 processed_urls_gsheet_current = set(df_gsheet_current['First Tweet URL'].dropna())
+        url_values = worksheet_tgt.col_values(TARGET_COLUMNS.index('First Tweet URL') + 1)
+        if len(url_values) >= 2:
+            processed_urls_gsheet_current = {u for u in url_values[1:] if u} # Skip header
             print(f"Found {len(processed_urls_gsheet_current)} URLs currently in Google Sheet.")
         else:
             print("Target Google Sheet is empty or has no data rows.")
@@ -718,22 +1009,26 @@ async def sync_local_to_gsheet(worksheet_tgt):
         processed_urls_gsheet_current = set() # Assume empty if read fails
 
 
-    # Identify rows in local state missing from Google Sheet
-    if df_local_final is None or df_local_final.empty:
-         print("Local state is empty. Nothing to upload.")
-         return
+    # Membership runs on 64-bit hashes, same as the dedup in process_data:
+    # uint64 np.isin beats object-dtype Series.isin on long URL strings.
+    remote_hashes = pd.util.hash_array(np.array(list(processed_urls_gsheet_current), dtype=object))
+    local_hashes = pd.util.hash_array(local_urls.to_numpy())
+    upload_mask = ~np.isin(local_hashes, remote_hashes)
 
-    # Ensure the URL column exists before filtering
-    if 'First Tweet URL' not in df_local_final.columns:
-        print("ERROR: 'First Tweet URL' column missing in local state file. Cannot determine rows to upload.")
-        return
-
-    df_to_upload = df_local_final[~df_local_final['First Tweet URL'].isin(processed_urls_gsheet_current)].copy()
-
-    if df_to_upload.empty:
+    if not upload_mask.any():
         print("No new rows found in local state to upload to Google Sheet. Sheet is up-to-date.")
+        record_synced_hash()
         return
 
+    if df_local_final is None:
+        # Only now read the full rows. Both reads concat snapshot-then-
+        # journal in the same order, so the positional mask from the
+        # URL-only read lines up with the full frame.
+        df_local_final = load_local_state()
+    # Read-only view is fine here - the serialization boundary below
+    # builds a fresh frame anyway.
+    df_to_upload = df_local_final.loc[upload_mask]
+
     print(f"Found {len(df_to_upload)} rows in local state missing from Google Sheet. Preparing upload...")
 
     # Upload missing rows
@@ -742,16 +1037,29 @@ async def sync_local_to_gsheet(worksheet_tgt):
         df_final_upload = df_to_upload[TARGET_COLUMNS].fillna('')
         rows_to_append = df_final_upload.values.tolist()
 
-        print(f"Appending {len(rows_to_append)} rows to Google Sheet...")
-        worksheet_tgt.append_rows(rows_to_append, value_input_option='USER_ENTERED', table_range='A1') # Append after last row
+        # Batched, but bounded: one request per APPEND_CHUNK_ROWS rows keeps
+        # each payload well under the API limit, and a failed chunk only
+        # re-uploads itself on retry instead of the whole backlog.
+        APPEND_CHUNK_ROWS = 500
+
+        @backoff.on_exception(backoff.expo, gspread.exceptions.APIError,
+                              max_tries=5, max_time=120, jitter=backoff.full_jitter)
+        def append_chunk(chunk):
+            worksheet_tgt.append_rows(chunk, value_input_option='USER_ENTERED',
+                                      insert_data_option='INSERT_ROWS', table_range='A1')
+
+        print(f"Appending {len(rows_to_append)} rows to Google Sheet in chunks of {APPEND_CHUNK_ROWS}...")
+        for chunk_start in range(0, len(rows_to_append), APPEND_CHUNK_ROWS):
+            append_chunk(rows_to_append[chunk_start:chunk_start + APPEND_CHUNK_ROWS])
         print("Successfully appended missing rows to Google Sheet.")
+        record_synced_hash()
 
     except Exception as e:
         error_msg = f"ERROR appending rows to target sheet '{worksheet_tgt.title}' during final sync: {e}"
         print(error_msg)
         import traceback
         tb_str = traceback.format_exc()
-        send_telegram_notification(f"🚨 {error_msg}\n```\n{tb_str[:1000]}\n```")
+        await send_telegram_notification_async(f"🚨 {error_msg}\n```\n{tb_str[:1000]}\n```")
 
 # --- Run Main Logic --- #
 if __name__ == "__main__":
@@ -1,14 +1,25 @@
 # reddit_scraper.py
 import os
+import io
 import datetime
+import traceback
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pytz
 import praw
 import gspread
-import pandas as pd
+try:
+    from pybloom_live import ScalableBloomFilter # Optional compact dedup store
+except ImportError:
+    ScalableBloomFilter = None
 from dotenv import load_dotenv
 from google.oauth2.service_account import Credentials
 import time
+import queue
+import backoff # Retry/backoff for transient Sheets API errors
 import requests # For Telegram
+from requests.adapters import HTTPAdapter
 
 print("Reddit Scraper starting...")
 
@@ -24,7 +35,8 @@ REDDIT_USER_AGENT = os.getenv('REDDIT_USER_AGENT') # IMPORTANT: Set a unique use
 
 # Scraping Settings
 SUBREDDITS_STR = os.getenv('REDDIT_SUBREDDITS', 'MachineLearning,programming,technology,startups,artificial')
-POST_LIMIT = int(os.getenv('REDDIT_POST_LIMIT', '25')) # Limit per subreddit
+POST_LIMIT = int(os.getenv('REDDIT_POST_LIMIT', '25')) # New posts collected per subreddit
+CONSEC_SEEN_CUTOFF = int(os.getenv('REDDIT_CONSEC_SEEN_CUTOFF', '10')) # Stop after this many already-seen posts in a row
 TIME_FILTER = os.getenv('REDDIT_TIMEFILTER', 'day') # e.g., 'hour', 'day', 'week', 'month', 'year', 'all'
 TARGET_SUBREDDITS = [sub.strip() for sub in SUBREDDITS_STR.split(',') if sub.strip()]
 
@@ -32,6 +44,7 @@ TARGET_SUBREDDITS = [sub.strip() for sub in SUBREDDITS_STR.split(',') if sub.str
 GOOGLE_SHEETS_URL = os.getenv('GOOGLE_SHEETS_URL')
 SERVICE_ACCOUNT_FILE = os.getenv('SERVICE_ACCOUNT_FILE_PATH', 'service_account.json')
 TARGET_SHEET_NAME = os.getenv('REDDIT_TARGET_SHEET_NAME', 'Sheet_Reddit_Raw') # Sheet for raw Reddit data
+SEEN_POSTS_DB_FILE = os.getenv('REDDIT_SEEN_DB_FILE', 'seen_posts.db') # Local dedup cache
 
 # General Config
 TARGET_TIMEZONE_STR = os.getenv('TARGET_TIMEZONE', 'UTC')
@@ -58,6 +71,27 @@ OUTPUT_COLUMNS = [
 # Note: Many Twitter-specific fields don't directly map. Use placeholders or None.
 # We'll use 'Tweet Text' for combined Title + Body, 'Conversation ID' for Post ID etc.
 
+# Positional index per column, used wherever a single field (e.g. Post
+# ID) has to be picked out of an assembled row.
+COL_IDX = {col: i for i, col in enumerate(OUTPUT_COLUMNS)}
+
+def _build_row(author_name, author_id, timestamp_str, combined_text, url,
+               num_comments, post_id, subreddit_display, score):
+    """Assembles one output row as a single list literal.
+
+    Positions mirror OUTPUT_COLUMNS exactly (checked by the assert
+    below), so the hot loop compiles to one BUILD_LIST instead of a
+    template copy plus twenty indexed stores."""
+    return [
+        "Reddit", author_name, author_id, author_name, timestamp_str,
+        combined_text, url, 0, 0, num_comments, 0,
+        0, 0, "Reddit Post", post_id,
+        subreddit_display, score, num_comments, post_id,
+        "", # Image URLs - no image scraping for Reddit posts yet
+    ]
+
+assert len(_build_row(*[None] * 9)) == len(OUTPUT_COLUMNS)
+
 # --- Validate essential config --- #
 if not all([REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT]):
     print("CRITICAL ERROR: Reddit API credentials (ID, Secret, User Agent) must be set in .env")
@@ -69,23 +103,39 @@ if 'YourRedditUsername' in REDDIT_USER_AGENT:
     print("CRITICAL ERROR: Please change 'YourRedditUsername' in REDDIT_USER_AGENT in your .env file to your actual Reddit username.")
     exit()
 
+def _short_tb(exc, n):
+    """Formats a bounded traceback for notifications: at most 20 frames,
+    capped at n characters, so a pathologically deep traceback never
+    materializes as one huge string just to be sliced."""
+    buf = io.StringIO()
+    traceback.print_exception(type(exc), exc, exc.__traceback__, file=buf, limit=20)
+    return buf.getvalue()[:n]
+
 # --- Initialize Services --- #
 reddit = None
 worksheet_tgt = None
+sheet_is_new = False # A just-created sheet needs its header row and has no priors
 TARGET_TIMEZONE = pytz.utc
 
-# Telegram Notification Function
-def send_telegram_notification(message):
-    """Sends a notification message to the configured Telegram chat."""
-    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
-        # print("Telegram token or chat ID not configured. Skipping notification.")
-        return
+# Telegram Notification Functions
+# Delivery happens on one background daemon thread draining a queue, so
+# callers enqueue in microseconds instead of blocking the scrape path
+# for up to the 15-second HTTP timeout per notification.
+_tg_queue = queue.Queue()
+
+# One pooled session keeps the TCP+TLS connection to api.telegram.org
+# warm across notifications, saving a ~100-300ms handshake per call.
+_tg_session = requests.Session()
+_tg_session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+def _deliver_telegram(message):
+    """Performs the actual (blocking) Telegram API call."""
     send_url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
     max_len = 4096
     truncated_message = message[:max_len] if len(message) > max_len else message
     payload = {'chat_id': TELEGRAM_CHAT_ID, 'text': truncated_message}
     try:
-        response = requests.post(send_url, json=payload, timeout=15)
+        response = _tg_session.post(send_url, json=payload, timeout=15)
         response.raise_for_status()
         # print(f"Sent Telegram notification: {truncated_message[:70].splitlines()[0]}...")
     except requests.exceptions.RequestException as e:
@@ -93,10 +143,34 @@ def send_telegram_notification(message):
     except Exception as e:
         print(f"An unexpected error occurred during Telegram notification sending: {e}")
 
-# Reddit API
-try:
+def _tg_worker():
+    while True:
+        message = _tg_queue.get()
+        try:
+            _deliver_telegram(message)
+        finally:
+            _tg_queue.task_done()
+
+threading.Thread(target=_tg_worker, daemon=True).start()
+
+def send_telegram_notification(message):
+    """Queues a notification message for the configured Telegram chat."""
+    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
+        # print("Telegram token or chat ID not configured. Skipping notification.")
+        return
+    _tg_queue.put(message)
+
+def flush_telegram_notifications():
+    """Blocks until every queued notification has been delivered.
+    Must run before the process exits - the worker is a daemon thread."""
+    _tg_queue.join()
+
+# Reddit and Sheets setup are independent, so they run in two worker
+# threads and startup costs the slower of the two instead of their sum
+# (the Sheets side alone is a couple of auth/open round-trips).
+def _init_reddit():
     print("Connecting to Reddit API...")
-    reddit = praw.Reddit(
+    r = praw.Reddit(
         client_id=REDDIT_CLIENT_ID,
         client_secret=REDDIT_CLIENT_SECRET,
         user_agent=REDDIT_USER_AGENT,
@@ -104,16 +178,11 @@ try:
         # username="YOUR_REDDIT_USERNAME",
         # password="YOUR_REDDIT_PASSWORD",
     )
-    reddit.read_only = True # Explicitly set read-only mode
-    print(f"Reddit API connected successfully. Read Only: {reddit.read_only}")
-except Exception as e:
-    error_msg = f"CRITICAL ERROR: Failed to connect to Reddit API: {e}"
-    print(error_msg)
-    send_telegram_notification(f"🚨 {error_msg}")
-    exit()
+    r.read_only = True # Explicitly set read-only mode
+    print(f"Reddit API connected successfully. Read Only: {r.read_only}")
+    return r
 
-# Google Sheets
-try:
+def _init_sheets():
     print("Authenticating with Google...")
     SHEET_SCOPES = [
         'https://www.googleapis.com/auth/spreadsheets',
@@ -125,21 +194,39 @@ try:
     sh = gc.open_by_url(GOOGLE_SHEETS_URL)
 
     try:
-        worksheet_tgt = sh.worksheet(TARGET_SHEET_NAME)
+        ws = sh.worksheet(TARGET_SHEET_NAME)
         print(f"Target sheet '{TARGET_SHEET_NAME}' found.")
         # We will append, so we don't need to clear unless desired
+        return ws, False
     except gspread.exceptions.WorksheetNotFound:
         print(f"Target sheet '{TARGET_SHEET_NAME}' not found. Creating it...")
-        # Create sheet with standard columns
-        worksheet_tgt = sh.add_worksheet(title=TARGET_SHEET_NAME, rows="1", cols=str(len(OUTPUT_COLUMNS)))
-        worksheet_tgt.append_row(OUTPUT_COLUMNS, value_input_option='USER_ENTERED')
-        print(f"Target sheet '{TARGET_SHEET_NAME}' created with headers.")
-
-except Exception as e:
-    error_msg = f"CRITICAL ERROR: Failed to authenticate or open/prepare Google Sheets: {e}"
-    print(error_msg)
-    send_telegram_notification(f"🚨 {error_msg}")
-    exit()
+        # The header row is not written here - it rides along with the
+        # first data append, folding one Sheets round-trip into another.
+        ws = sh.add_worksheet(title=TARGET_SHEET_NAME, rows="1", cols=str(len(OUTPUT_COLUMNS)))
+        print(f"Target sheet '{TARGET_SHEET_NAME}' created.")
+        return ws, True
+
+with ThreadPoolExecutor(max_workers=2) as _init_pool:
+    _reddit_future = _init_pool.submit(_init_reddit)
+    _sheets_future = _init_pool.submit(_init_sheets)
+
+    try:
+        reddit = _reddit_future.result()
+    except Exception as e:
+        error_msg = f"CRITICAL ERROR: Failed to connect to Reddit API: {e}"
+        print(error_msg)
+        send_telegram_notification(f"🚨 {error_msg}")
+        flush_telegram_notifications()
+        exit()
+
+    try:
+        worksheet_tgt, sheet_is_new = _sheets_future.result()
+    except Exception as e:
+        error_msg = f"CRITICAL ERROR: Failed to authenticate or open/prepare Google Sheets: {e}"
+        print(error_msg)
+        send_telegram_notification(f"🚨 {error_msg}")
+        flush_telegram_notifications()
+        exit()
 
 # Timezone
 try:
@@ -148,51 +235,130 @@ except pytz.exceptions.UnknownTimeZoneError:
     print(f"Warning: Unknown timezone '{TARGET_TIMEZONE_STR}'. Defaulting to UTC.")
     # TARGET_TIMEZONE remains UTC
 
+# Rows are uploaded in bounded chunks so one huge append can't blow
+# Sheets' per-request limits, and each chunk retries transient 429/5xx
+# APIErrors with exponential backoff and jitter instead of dropping the
+# whole run's rows on a momentary rate limit.
+APPEND_CHUNK_ROWS = 500
+
+@backoff.on_exception(backoff.expo, gspread.exceptions.APIError,
+                      max_tries=5, max_time=120, jitter=backoff.full_jitter)
+def _append_chunk(rows):
+    # RAW skips Sheets' server-side per-cell parsing (date/number/formula
+    # detection) that USER_ENTERED forces; numeric fields are sent as
+    # native ints so their columns stay numeric without that parsing.
+    worksheet_tgt.append_rows(rows, value_input_option='RAW', table_range='A1')
+
 # --- Main Scraping Logic --- #
 def scrape_reddit():
     """Fetches posts from target subreddits and appends them to the Google Sheet."""
     print("\n--- Starting Reddit Scrape ---")
     start_time = time.time()
     all_new_rows = []
-    processed_post_ids = set() # Basic state to avoid duplicates within this run
-
-    # Optional: Load existing post IDs from the target sheet to avoid duplicates across runs
-    try:
-        existing_data = worksheet_tgt.get_all_values()
-        if len(existing_data) >= 2:
-            df_existing = pd.DataFrame(existing_data[1:], columns=existing_data[0])
-            if 'Post ID' in df_existing.columns:
-                processed_post_ids.update(df_existing['Post ID'].dropna().astype(str).tolist())
-                print(f"Loaded {len(processed_post_ids)} existing post IDs from target sheet.")
-    except Exception as e:
-        print(f"Warning: Could not read existing data from target sheet to check for duplicates: {e}")
-
-
-    for subreddit_name in TARGET_SUBREDDITS:
-        print(f"\n--- Processing Subreddit: r/{subreddit_name} ---")
-        subreddit_rows = 0
+    # Timezone name and offset are resolved once per run; per post that
+    # leaves a gmtime call and one f-string instead of a pytz astimezone
+    # (DST table lookup) plus strftime. Only a DST transition inside the
+    # scraped window could skew a timestamp, and then by the DST delta.
+    local_now = datetime.datetime.now(pytz.utc).astimezone(TARGET_TIMEZONE)
+    tz_suffix = local_now.strftime('%Z%z')
+    tz_offset_seconds = local_now.utcoffset().total_seconds()
+    # Seen-ID membership store. The Bloom filter costs ~10 bits per ID
+    # instead of a ~60-byte str per set entry, so checks stay in a few
+    # cache lines even with 100k+ historical IDs; a false positive only
+    # skips one post, which is fine for dedup. The plain set is the
+    # fallback when pybloom_live isn't installed.
+    if ScalableBloomFilter is not None:
+        processed_post_ids = ScalableBloomFilter(initial_capacity=10000, error_rate=0.01)
+    else:
+        processed_post_ids = set()
+
+    # Known post IDs live in a local SQLite table, so the per-run dedup
+    # load is a local file read instead of a Sheets call whose payload
+    # grows with the sheet. The sheet's Post ID column is read once to
+    # seed a brand-new database; after that, runs don't touch the sheet
+    # for dedup at all. IDs are committed to the table only after a
+    # successful append, so failed uploads stay eligible next run.
+    seen_conn = sqlite3.connect(SEEN_POSTS_DB_FILE)
+    seen_conn.execute('CREATE TABLE IF NOT EXISTS seen (post_id TEXT PRIMARY KEY)')
+    known_ids = [row[0] for row in seen_conn.execute('SELECT post_id FROM seen')]
+    if known_ids:
+        for known_id in known_ids:
+            processed_post_ids.add(known_id)
+        print(f"Loaded {len(known_ids)} known post IDs from '{SEEN_POSTS_DB_FILE}'.")
+    elif sheet_is_new:
+        print("Target sheet was just created - no existing post IDs to load.")
+    else:
+        try:
+            id_values = worksheet_tgt.col_values(OUTPUT_COLUMNS.index('Post ID') + 1)
+            sheet_ids = list(filter(None, id_values[1:])) # Skip header row
+            for existing_id in sheet_ids:
+                processed_post_ids.add(existing_id)
+            seen_conn.executemany('INSERT OR IGNORE INTO seen VALUES (?)',
+                                  ((pid,) for pid in sheet_ids))
+            seen_conn.commit()
+            print(f"Seeded '{SEEN_POSTS_DB_FILE}' with {len(sheet_ids)} post IDs from target sheet.")
+        except Exception as e:
+            print(f"Warning: Could not read existing data from target sheet to check for duplicates: {e}")
+
+
+    # Subreddits are fetched in parallel worker threads - PRAW's blocking
+    # HTTPS round-trips dominate wall time and prawcore's session is
+    # thread-safe, so overlapping them cuts the fetch phase to roughly
+    # the slowest subreddit. PRAW's built-in rate limiter still paces
+    # the shared request budget, which also replaces the old fixed
+    # 2-second sleep between subreddits. The dedup store is guarded by a
+    # lock since workers check-and-add concurrently.
+    seen_lock = threading.Lock()
+
+    # Lazy Subreddit handles are built once up front and shared by the
+    # workers, so every listing runs through the same prawcore session
+    # and its kept-alive HTTPS connection pool.
+    subreddits = {name: reddit.subreddit(name) for name in TARGET_SUBREDDITS}
+
+    def fetch_subreddit(subreddit_name):
+        print(f"--- Processing Subreddit: r/{subreddit_name} ---")
+        rows = []
         try:
-            subreddit = reddit.subreddit(subreddit_name)
             # Fetch top posts within the time filter
             # Other options: .hot(), .new(), .controversial()
-            print(f"Fetching top {POST_LIMIT} posts from the last '{TIME_FILTER}'...")
-            posts = subreddit.top(time_filter=TIME_FILTER, limit=POST_LIMIT)
+            # The listing streams without a fixed limit and stops early:
+            # once POST_LIMIT new posts are collected, or - only after at
+            # least POST_LIMIT entries have been examined - after
+            # CONSEC_SEEN_CUTOFF consecutive already-seen IDs. top() is
+            # score-ordered, not time-ordered, so a run of seen posts at
+            # the head of a stable ranking is normal; the examined floor
+            # guarantees everything the old fixed-limit scan would have
+            # covered is still looked at before the heuristic can fire.
+            posts = subreddits[subreddit_name].top(time_filter=TIME_FILTER, limit=None)
+            consec_seen = 0
+            examined = 0
 
             for post in posts:
                 post_id = str(post.id)
-                if post_id in processed_post_ids:
-                    # print(f"  Skipping already processed post ID: {post_id}")
-                    continue
+                examined += 1
+                with seen_lock:
+                    if post_id in processed_post_ids:
+                        # print(f"  Skipping already processed post ID: {post_id}")
+                        consec_seen += 1
+                        if consec_seen >= CONSEC_SEEN_CUTOFF and examined >= POST_LIMIT:
+                            break
+                        continue
+                    processed_post_ids.add(post_id)
+                consec_seen = 0
 
                 # Extract data
                 title = post.title
                 body = post.selftext
                 author_obj = post.author
                 author_name = str(author_obj) if author_obj else "[deleted]"
-                author_id = str(author_obj.id) if author_obj else "[deleted]"
-                timestamp_utc = datetime.datetime.fromtimestamp(post.created_utc, tz=pytz.utc)
-                timestamp_local = timestamp_utc.astimezone(TARGET_TIMEZONE)
-                timestamp_str = timestamp_local.strftime('%Y-%m-%d %H:%M:%S %Z%z')
+                # The t2_-prefixed author fullname ships in the listing
+                # JSON itself; touching author_obj.id would lazy-load the
+                # full Redditor with an extra /user/<name>/about request
+                # per post (deleted/suspended authors lack the field).
+                author_id = getattr(post, 'author_fullname', None) or "[deleted]"
+                t = time.gmtime(post.created_utc + tz_offset_seconds)
+                timestamp_str = (f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d} "
+                                 f"{t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d} {tz_suffix}")
                 url = f"https://www.reddit.com{post.permalink}"
                 score = post.score
                 num_comments = post.num_comments
@@ -204,54 +370,42 @@ def scrape_reddit():
                 if body:
                     combined_text += f"\n\nBody:\n{body}"
 
-                # Map to standard schema (approximations)
-                row_data = {
-                    "Platform": "Reddit",
-                    "Username": author_name,
-                    "User ID": author_id,
-                    "Display Name": author_name,
-                    "First Tweet Timestamp": timestamp_str,
-                    "Tweet Text": combined_text,
-                    "Tweet URL": url,
-                    "Likes": 0,
-                    "Retweets": 0,
-                    "Replies": num_comments,
-                    "Quotes": 0,
-                    "Bookmarks": 0,
-                    "Views": 0,
-                    "Tweet Type": "Reddit Post",
-                    "Conversation ID": post_id,
-                    "Subreddit": subreddit_display,
-                    "Score": score,
-                    "Num Comments": num_comments,
-                    "Post ID": post_id,
-                    "Image URLs": "" # Assuming no image scraping for Reddit posts yet
-                }
-
-                # Ensure all columns are present, fill missing with empty string
-                row_list = [str(row_data.get(col, '')) for col in OUTPUT_COLUMNS]
-                all_new_rows.append(row_list)
-                processed_post_ids.add(post_id) # Add to processed set for this run
-                subreddit_rows += 1
-
-            print(f"  Fetched {subreddit_rows} new posts from r/{subreddit_name}.")
+                # Map to standard schema (approximations) in one shot.
+                rows.append(_build_row(author_name, author_id, timestamp_str,
+                                       combined_text, url, num_comments,
+                                       post_id, subreddit_display, score))
+                if len(rows) >= POST_LIMIT:
+                    break
+
+            print(f"  Fetched {len(rows)} new posts from r/{subreddit_name}.")
 
         except praw.exceptions.PRAWException as e:
             print(f"  ERROR processing subreddit r/{subreddit_name}: {e}")
             send_telegram_notification(f"⚠️ Error processing subreddit r/{subreddit_name}: {e}")
         except Exception as e:
             print(f"  UNEXPECTED ERROR processing subreddit r/{subreddit_name}: {e}")
-            import traceback
-            tb_str = traceback.format_exc()
-            send_telegram_notification(f"🚨 Unexpected Error processing r/{subreddit_name}: {e}\n```\n{tb_str[:1000]}\n```")
-        # Add a small delay between subreddits to be polite to Reddit API
-        time.sleep(2)
+            send_telegram_notification(f"🚨 Unexpected Error processing r/{subreddit_name}: {e}\n```\n{_short_tb(e, 1000)}\n```")
+        return rows
+
+    max_workers = min(8, len(TARGET_SUBREDDITS)) or 1
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for rows in executor.map(fetch_subreddit, TARGET_SUBREDDITS):
+            all_new_rows.extend(rows)
 
     # Append new rows to Google Sheet
     if all_new_rows:
         print(f"\nAppending {len(all_new_rows)} new rows to Google Sheet '{TARGET_SHEET_NAME}'...")
         try:
-            worksheet_tgt.append_rows(all_new_rows, value_input_option='USER_ENTERED', table_range='A1')
+            # A just-created sheet gets its header as the first uploaded
+            # row; the header is kept out of all_new_rows so the seen-ID
+            # bookkeeping below only ever sees real posts.
+            rows_to_upload = [OUTPUT_COLUMNS] + all_new_rows if sheet_is_new else all_new_rows
+            for i in range(0, len(rows_to_upload), APPEND_CHUNK_ROWS):
+                _append_chunk(rows_to_upload[i:i + APPEND_CHUNK_ROWS])
+            post_id_idx = COL_IDX['Post ID']
+            seen_conn.executemany('INSERT OR IGNORE INTO seen VALUES (?)',
+                                  ((row[post_id_idx],) for row in all_new_rows))
+            seen_conn.commit()
             print("Successfully appended data.")
             end_time = time.time()
             duration = end_time - start_time
@@ -261,13 +415,19 @@ def scrape_reddit():
         except Exception as e:
             error_msg = f"ERROR appending rows to target sheet '{TARGET_SHEET_NAME}': {e}"
             print(error_msg)
-            import traceback
-            tb_str = traceback.format_exc()
-            send_telegram_notification(f"🚨 {error_msg}\n```\n{tb_str[:1000]}\n```")
+            send_telegram_notification(f"🚨 {error_msg}\n```\n{_short_tb(e, 1000)}\n```")
     else:
+        if sheet_is_new:
+            # Nothing scraped, but the fresh sheet still needs its header.
+            try:
+                _append_chunk([OUTPUT_COLUMNS])
+            except Exception as e:
+                print(f"ERROR writing header row to new sheet '{TARGET_SHEET_NAME}': {e}")
         print("\nNo new Reddit posts found to append.")
         send_telegram_notification("ℹ️ Reddit Scraper run finished: No new posts found.")
 
+    seen_conn.close()
+
 
 # --- Run Main Logic --- #
 if __name__ == "__main__":
@@ -280,8 +440,8 @@ if __name__ == "__main__":
     except Exception as main_e:
         error_msg = f"CRITICAL UNHANDLED ERROR in Reddit scraper main execution: {main_e}"
         print(error_msg)
-        import traceback
-        tb_str = traceback.format_exc()
-        send_telegram_notification(f"🚨 {error_msg}\n```\n{tb_str[:3500]}\n``` Reddit scraper stopped.")
+        send_telegram_notification(f"🚨 {error_msg}\n```\n{_short_tb(main_e, 3500)}\n``` Reddit scraper stopped.")
+    finally:
+        flush_telegram_notifications()
 
 print("\nReddit Scraper finished.") 
\ No newline at end of file
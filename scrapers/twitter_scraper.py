@@ -1,15 +1,25 @@
 import asyncio
-from twscrape import API, gather
+from collections import Counter
+from operator import itemgetter
+from twscrape import API
 from twscrape.logger import set_log_level
 import gspread
 from google.oauth2.service_account import Credentials
 import datetime
 import pytz # Import pytz for timezone handling
 import json # Import json for reading config file
+try:
+    import orjson # Optional accelerator for state/config (de)serialization
+except ImportError:
+    orjson = None
 import os   # Import os for environment variables
+import hashlib # For the header content hash stored in state
 import time # Import time for sleep (though asyncio.sleep is used in async)
 import random # Import random for randomized sleep
 import requests # Import requests for Telegram notifications
+import backoff # Retry/backoff for transient Sheets API errors
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv # Import dotenv
 
 # --- Load Environment Variables --- #
@@ -24,7 +34,11 @@ TARGET_TIMEZONE_STR = os.getenv('TARGET_TIMEZONE', 'UTC')
 ACCOUNTS_FILE = os.getenv('ACCOUNTS_CONFIG_FILE', 'accounts_config.json')
 USERNAMES_FILE = os.getenv('USERNAMES_FILE', 'usernames.json')
 STATE_FILE = os.getenv('STATE_FILE', 'last_seen_ids.json')
+PROFILE_CACHE_FILE = os.getenv('PROFILE_CACHE_FILE', 'user_profile_cache.json')
+PROFILE_CACHE_TTL_SECONDS = float(os.getenv('PROFILE_CACHE_TTL_DAYS', '7')) * 86400
 TWEET_FETCH_LIMIT = int(os.getenv('TWEET_FETCH_LIMIT', '30'))
+CONSEC_OLD_TWEET_CUTOFF = int(os.getenv('CONSEC_OLD_TWEET_CUTOFF', '5')) # Stop after this many already-seen tweets in a row
+MAX_CONCURRENT_USERS = int(os.getenv('MAX_CONCURRENT_USERS', '5'))
 MIN_DELAY_BETWEEN_USERS_SECONDS = float(os.getenv('MIN_DELAY_BETWEEN_USERS_SECONDS', '5'))
 MAX_DELAY_BETWEEN_USERS_SECONDS = float(os.getenv('MAX_DELAY_BETWEEN_USERS_SECONDS', '20'))
 MIN_DELAY_BEFORE_FETCH_SECONDS = float(os.getenv('MIN_DELAY_BEFORE_FETCH_SECONDS', '1'))
@@ -38,12 +52,40 @@ if not all([TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, GOOGLE_SHEETS_URL]):
     exit()
 
 # --- Telegram Notification Function --- #
+# One pooled session so every notification reuses the warm TCP+TLS
+# connection to api.telegram.org instead of paying a fresh handshake;
+# transient 429/5xx responses retry with backoff at the transport layer.
+telegram_session = requests.Session()
+telegram_session.mount('https://', HTTPAdapter(
+    pool_connections=2, pool_maxsize=4,
+    # allowed_methods=None lets the retry policy cover POST too -
+    # urllib3's default set excludes it, and sendMessage is a POST.
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=None)))
+
+# Identical notification text within this window is sent only once, so
+# a repeating failure (e.g. every user rate-limited the same way) can't
+# spam the chat from one process.
+NOTIFICATION_DEDUP_TTL_SECONDS = 60
+_recent_notifications = {}
+
 def send_telegram_notification(message):
     """Sends a notification message to the configured Telegram chat."""
     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
         print("Telegram token or chat ID not configured. Skipping notification.")
         return
 
+    now = time.monotonic()
+    last_sent = _recent_notifications.get(message)
+    if last_sent is not None and now - last_sent < NOTIFICATION_DEDUP_TTL_SECONDS:
+        print("Skipping duplicate Telegram notification (identical text sent recently).")
+        return
+    _recent_notifications[message] = now
+    if len(_recent_notifications) > 64: # Occasional prune of expired entries
+        cutoff = now - NOTIFICATION_DEDUP_TTL_SECONDS
+        for stale in [m for m, t in _recent_notifications.items() if t < cutoff]:
+            del _recent_notifications[stale]
+
     send_url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
     max_len = 4096
     truncated_message = message[:max_len] if len(message) > max_len else message
@@ -54,7 +96,7 @@ def send_telegram_notification(message):
         # 'parse_mode': 'Markdown' # Keep commented out for now
     }
     try:
-        response = requests.post(send_url, json=payload, timeout=15)
+        response = telegram_session.post(send_url, json=payload, timeout=15)
         response.raise_for_status()
         print(f"Sent Telegram notification: {truncated_message[:70].splitlines()[0]}...")
     except requests.exceptions.RequestException as e:
@@ -62,6 +104,13 @@ def send_telegram_notification(message):
     except Exception as e:
         print(f"An unexpected error occurred during Telegram notification sending: {e}")
 
+async def send_telegram_notification_async(message):
+    """Async variant for use inside the event loop - the pooled requests
+    call runs in a worker thread so a slow Telegram round-trip (up to the
+    15s timeout) never stalls concurrent user fetches. Sync paths
+    (startup, KeyboardInterrupt, helpers) keep the blocking version."""
+    await asyncio.to_thread(send_telegram_notification, message)
+
 
 # --- Google Sheets Setup --- #
 worksheet = None
@@ -91,12 +140,92 @@ except pytz.exceptions.UnknownTimeZoneError:
     TARGET_TIMEZONE = pytz.utc
 
 
+# --- Sheet Header --- #
+# The expected header row, plus a short content hash persisted in the
+# state file. Cycles skip the header GET entirely while the stored hash
+# matches; editing HEADER changes the hash and forces a re-verify.
+HEADER = (
+    "Username", "User ID", "Display Name", "Tweet Timestamp", "Tweet Text", "Tweet URL",
+    "Likes", "Retweets", "Replies", "Quotes", "Bookmarks", "Views",
+    "Tweet Type", "Conversation ID" # <-- Reverted Header
+)
+HEADER_HASH = hashlib.blake2b('|'.join(HEADER).encode(), digest_size=8).hexdigest()
+
+# --- Sheet Payload Helper --- #
+def _cells_row(values):
+    """Converts one flat row into a RowData dict for batchUpdate requests."""
+    cells = []
+    for v in values:
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            cells.append({'userEnteredValue': {'numberValue': v}})
+        else:
+            cells.append({'userEnteredValue': {'stringValue': str(v)}})
+    return {'values': cells}
+
+def _tweet_row(tweet, username, user_id_str, user_display_name, tweet_timestamp):
+    """Builds one sheet row from a twscrape Tweet.
+
+    Attribute lookups happen once each against a single source object
+    (the retweeted original when present, the tweet itself otherwise).
+    This is the hottest pure-Python path in a cycle - hundreds of tweets
+    per run - so keeping per-tweet attribute churn down matters."""
+    src = tweet.retweetedTweet
+    if src is not None:
+        tweet_type = "Retweet"
+        tweet_url = src.url or tweet.url # Prefer original URL
+        bookmarks = src.bookmarkCount or 0 # Note: attribute name differs from non-RT
+    else:
+        src = tweet
+        tweet_url = src.url
+        bookmarks = src.bookmarkedCount or 0
+        if tweet.quotedTweet:
+            tweet_type = "Quote Tweet"
+        elif tweet.inReplyToTweetId:
+            tweet_type = "Reply"
+        else:
+            tweet_type = "Original Tweet"
+    conversation_id = src.conversationId
+    return [
+        username, user_id_str, user_display_name, tweet_timestamp,
+        src.rawContent, tweet_url, src.likeCount or 0, src.retweetCount or 0,
+        src.replyCount or 0, src.quoteCount or 0, bookmarks,
+        src.viewCount or 0, tweet_type,
+        str(conversation_id) if conversation_id else "N/A",
+    ]
+
+# --- Sheets Call Retry Wrappers --- #
+# The Sheets API intermittently returns 429/5xx under quota pressure;
+# without retries one transient error drops a whole cycle's rows.
+# Exponential backoff with full jitter rides out short rate-limit
+# windows and gives up within two minutes so a real outage still
+# surfaces through the normal error path.
+@backoff.on_exception(backoff.expo, gspread.exceptions.APIError,
+                      max_tries=5, max_time=120, jitter=backoff.full_jitter)
+def _sheets_values_batch_get(ranges):
+    return sh.values_batch_get(ranges)
+
+@backoff.on_exception(backoff.expo, gspread.exceptions.APIError,
+                      max_tries=5, max_time=120, jitter=backoff.full_jitter)
+def _sheets_batch_update(body):
+    return sh.batch_update(body)
+
 # --- Helper Functions for State Management --- #
+# orjson parses/serializes JSON several times faster than the stdlib and
+# works on bytes directly; orjson.JSONDecodeError subclasses
+# json.JSONDecodeError, so the existing error handling covers both.
+def _json_loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def _json_dumps_bytes(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
 def load_last_seen_ids(filepath):
     """Loads the last seen tweet IDs from a JSON file."""
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        with open(filepath, 'rb') as f:
+            return _json_loads(f.read())
     except FileNotFoundError:
         print(f"State file '{filepath}' not found, starting fresh.")
         return {}
@@ -110,19 +239,53 @@ def load_last_seen_ids(filepath):
         return {}
 
 def save_last_seen_ids(filepath, state_data):
-    """Saves the last seen tweet IDs to a JSON file."""
+    """Saves the last seen tweet IDs to a JSON file atomically.
+
+    The state is written compact to a sibling tempfile and swapped in
+    with os.replace, so a crash mid-write can never leave the corrupt
+    half-file the load path has to guard against."""
+    tmp_path = filepath + '.tmp'
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(state_data, f, indent=4)
+        with open(tmp_path, 'wb') as f:
+            f.write(_json_dumps_bytes(state_data))
+        os.replace(tmp_path, filepath)
     except Exception as e:
         print(f"Error saving state to '{filepath}': {e}")
         send_telegram_notification(f"🚨 ERROR saving state to '{filepath}': {e}")
 
+def load_profile_cache(filepath):
+    """Loads the cached user id/displayname entries from a JSON file.
+
+    User profiles change rarely, so caching them with a TTL saves one
+    user_by_login round-trip per user per cycle. Cache loss is harmless -
+    entries are simply refetched - so failures just start empty."""
+    try:
+        with open(filepath, 'rb') as f:
+            return _json_loads(f.read())
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Error loading profile cache '{filepath}': {e}. Starting with empty cache.")
+        return {}
+
+def save_profile_cache(filepath, cache):
+    """Saves the user profile cache atomically (tempfile + os.replace)."""
+    tmp_path = filepath + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(_json_dumps_bytes(cache))
+        os.replace(tmp_path, filepath)
+    except Exception as e:
+        print(f"Error saving profile cache to '{filepath}': {e}")
+
 # --- Main Scraping Logic Function --- #
-async def run_scrape_cycle(api, target_usernames_list, last_seen_state, initial_state_keys):
+async def run_scrape_cycle(api, target_usernames_list, last_seen_state):
     """Runs a single cycle of fetching, processing, and saving tweets."""
     print(f"\n--- Starting scrape cycle at {datetime.datetime.now(TARGET_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S %Z')} ---")
     cycle_errors = [] # Collect non-critical errors for summary
+    state_dirty = False # Skip the end-of-cycle state write when nothing changed
+    profile_cache = load_profile_cache(PROFILE_CACHE_FILE)
+    profile_cache_dirty = False
 
     # --- Check Account Pool Status --- #
     # try:
@@ -131,7 +294,7 @@ async def run_scrape_cycle(api, target_usernames_list, last_seen_state, initial_
     #     if not active_accounts:
     #         error_msg = "CRITICAL: No active/logged-in Twitter accounts found in the pool. Please refresh cookies."
     #         print(error_msg)
-    #         send_telegram_notification(f"🚨 {error_msg}")
+    #         await send_telegram_notification_async(f"🚨 {error_msg}")
     #         return False # Indicate cycle failed due to no active accounts
     #     else:
     #         print(f"  {len(active_accounts)} active account(s) available in the pool.")
@@ -143,44 +306,89 @@ async def run_scrape_cycle(api, target_usernames_list, last_seen_state, initial_
     # --- End Check Account Pool Status --- #
 
     # --- Prepare Headers (Run only if needed within the cycle) --- #
-    header = [
-        "Username", "User ID", "Display Name", "Tweet Timestamp", "Tweet Text", "Tweet URL",
-        "Likes", "Retweets", "Replies", "Quotes", "Bookmarks", "Views",
-        "Tweet Type", "Conversation ID" # <-- Reverted Header
-    ]
-    try:
-        current_header = worksheet.row_values(1)
-        if current_header != header:
-             worksheet.insert_row(header, 1)
-             print("Added/Corrected header row in Google Sheet.")
-    except gspread.exceptions.APIError as api_err:
-         print(f"Google Sheets API error checking/writing header: {api_err}")
-         cycle_errors.append(f"Google Sheets API error checking/writing header: {api_err}")
-    except Exception as inner_e:
-         print(f"Failed to check/write header: {inner_e}")
-         cycle_errors.append(f"ERROR: Failed during header check/write in Google Sheet: {inner_e}")
-
-    print(f"Fetching details for {len(target_usernames_list)} usernames...")
+    # The header only needs checking until the current HEADER content has
+    # been verified once; its hash is cached in the state file (underscore
+    # key, so it never collides with a username) and later cycles skip
+    # the API read. A needed correction is queued here and submitted
+    # together with the data append in a single batchUpdate call instead
+    # of its own write.
+    pending_sheet_requests = []
+    if last_seen_state.get('_header_hash') != HEADER_HASH:
+        try:
+            resp = _sheets_values_batch_get([f"'{worksheet.title}'!1:1"])
+            values = resp.get('valueRanges', [{}])[0].get('values', [])
+            current_header = tuple(values[0]) if values else ()
+            if current_header != HEADER:
+                pending_sheet_requests.append({'insertDimension': {
+                    'range': {'sheetId': worksheet.id, 'dimension': 'ROWS',
+                              'startIndex': 0, 'endIndex': 1},
+                    'inheritFromBefore': False}})
+                pending_sheet_requests.append({'updateCells': {
+                    'start': {'sheetId': worksheet.id, 'rowIndex': 0, 'columnIndex': 0},
+                    'rows': [_cells_row(HEADER)],
+                    'fields': 'userEnteredValue'}})
+                print("Queued header correction for Google Sheet.")
+            else:
+                last_seen_state['_header_hash'] = HEADER_HASH
+                state_dirty = True
+        except gspread.exceptions.APIError as api_err:
+            print(f"Google Sheets API error checking/writing header: {api_err}")
+            cycle_errors.append(f"Google Sheets API error checking/writing header: {api_err}")
+        except Exception as inner_e:
+            print(f"Failed to check/write header: {inner_e}")
+            cycle_errors.append(f"ERROR: Failed during header check/write in Google Sheet: {inner_e}")
+
+    print(f"Fetching details for {len(target_usernames_list)} usernames (up to {MAX_CONCURRENT_USERS} in parallel)...")
     all_rows_to_append = []
     processed_tweet_ids_this_run = set()
-
-    for username in target_usernames_list:
+    # Users are fetched concurrently, bounded by the semaphore so no more
+    # than MAX_CONCURRENT_USERS requests are in flight against Twitter at
+    # once. Everything runs on the one event loop thread, so the shared
+    # set/state mutations between awaits need no extra locking; each
+    # worker returns its own row list and they are merged after gather.
+    user_semaphore = asyncio.Semaphore(MAX_CONCURRENT_USERS)
+
+    async def process_user(username):
+        async with user_semaphore:
+            return await _fetch_user_rows(username)
+
+    async def _fetch_user_rows(username):
+        nonlocal state_dirty, profile_cache_dirty
         print(f"--- Processing @{username} ---")
+        user_rows = []
         user_display_name = "N/A"
         user_id_str = "N/A"
+        made_tweet_fetch = False # Gates the inter-user courtesy delay
         last_seen_id = last_seen_state.get(username, 0)
         # print(f"  Last seen tweet ID for {username}: {last_seen_id}") # Verbose
 
         try:
-            # Fetch User Profile
-            user = await api.user_by_login(username)
-            if user:
-                user_id_str = str(user.id)
-                # print(f"  User ID: {user_id_str}")
-                user_data = user.dict()
-                user_display_name = user_data.get('displayname', 'N/A')
-                # print(f"  Display Name: {user_display_name}")
-
+            # Resolve user ID and display name, preferring the local cache.
+            # Profiles change rarely, so a fresh cache entry saves one
+            # user_by_login round-trip per user per cycle.
+            user_id = None
+            cached = profile_cache.get(username)
+            if cached and time.time() - cached.get('cached_at', 0) < PROFILE_CACHE_TTL_SECONDS:
+                user_id = int(cached['id'])
+                user_id_str = cached['id']
+                user_display_name = cached.get('displayname', 'N/A')
+            else:
+                user = await api.user_by_login(username)
+                if user:
+                    user_id = user.id
+                    user_id_str = str(user.id)
+                    # print(f"  User ID: {user_id_str}")
+                    user_data = user.dict()
+                    user_display_name = user_data.get('displayname', 'N/A')
+                    # print(f"  Display Name: {user_display_name}")
+                    profile_cache[username] = {
+                        'id': user_id_str,
+                        'displayname': user_display_name,
+                        'cached_at': time.time(),
+                    }
+                    profile_cache_dirty = True
+
+            if user_id is not None:
                 # Fetch User's Recent Tweets & Replies
                 # print(f"  Fetching recent tweets and replies for @{username} (User ID: {user_id_str})...")
                 try:
@@ -190,83 +398,62 @@ async def run_scrape_cycle(api, target_usernames_list, last_seen_state, initial_
                     await asyncio.sleep(pre_fetch_delay)
                     # --- End Add delay before fetching ---
 
-                    fetched_tweets = await gather(api.user_tweets_and_replies(user.id, limit=TWEET_FETCH_LIMIT))
-                    new_tweets = [t for t in fetched_tweets if t.id > last_seen_id]
-
-                    if new_tweets:
-                        print(f"  Found {len(new_tweets)} new tweet(s) (out of {len(fetched_tweets)} fetched).")
-                        new_tweets.reverse()
-                        max_new_id = last_seen_id
-
-                        for tweet in new_tweets:
-                            if tweet.id > max_new_id:
-                                max_new_id = tweet.id
-                            if tweet.id in processed_tweet_ids_this_run:
-                                print(f"    Skipping duplicate tweet ID {tweet.id} within this run.")
-                                continue
-                            processed_tweet_ids_this_run.add(tweet.id)
-
-                            # Process tweet data
-                            utc_time = tweet.date
-                            local_time = utc_time.astimezone(TARGET_TIMEZONE)
-                            tweet_timestamp = local_time.strftime('%Y-%m-%d %H:%M:%S %Z%z')
-
-                            # Determine Tweet Type and Extract Content
-                            if tweet.retweetedTweet:
-                                tweet_type = "Retweet"
-                                # Use original tweet's content if available
-                                original_tweet = tweet.retweetedTweet
-                                tweet_text = original_tweet.rawContent if original_tweet else "[Retweeted content not available]"
-                                tweet_url = original_tweet.url if original_tweet else tweet.url # Prefer original URL
-                                likes = original_tweet.likeCount or 0
-                                retweets = original_tweet.retweetCount or 0
-                                replies = original_tweet.replyCount or 0
-                                quotes = original_tweet.quoteCount or 0
-                                bookmarks = original_tweet.bookmarkCount or 0 # Note: might be different attribute name
-                                views = original_tweet.viewCount or 0
-                                conversation_id_str = str(original_tweet.conversationId) if original_tweet and original_tweet.conversationId else "N/A"
-                            else:
-                                # Original, Quote, or Reply
-                                tweet_text = tweet.rawContent
-                                tweet_url = tweet.url
-                                likes = tweet.likeCount or 0
-                                retweets = tweet.retweetCount or 0
-                                replies = tweet.replyCount or 0
-                                quotes = tweet.quoteCount or 0
-                                bookmarks = tweet.bookmarkedCount or 0 # Note: might be different attribute name
-                                views = tweet.viewCount or 0
-                                conversation_id_str = str(tweet.conversationId) if tweet.conversationId else "N/A"
-
-                                if tweet.quotedTweet:
-                                    tweet_type = "Quote Tweet"
-                                elif tweet.inReplyToTweetId:
-                                    tweet_type = "Reply"
-                                else:
-                                    tweet_type = "Original Tweet"
-
-                            # --- Consolidate Row Creation (common fields) ---
-                            # Note: User details (username, user_id_str, user_display_name) and timestamp are set outside this block
-
-                            row = [
-                                username, user_id_str, user_display_name, tweet_timestamp,
-                                tweet_text, tweet_url, likes, retweets, replies, quotes,
-                                bookmarks, views, tweet_type, conversation_id_str
-                            ]
-                            all_rows_to_append.append(row)
-
-                        # Update state
-                        if max_new_id > last_seen_id:
-                            last_seen_state[username] = max_new_id
-                            print(f"  Updated last seen ID for {username} to {max_new_id}")
-
-                    else:
-                        # print(f"  No new tweets found for {username} since ID {last_seen_id}.") # Verbose
-                        # Initialize state for new users
-                        if username not in initial_state_keys and fetched_tweets:
-                             latest_fetched_id = max((t.id for t in fetched_tweets), default=0)
-                             if latest_fetched_id > last_seen_id:
-                                 last_seen_state[username] = latest_fetched_id
-                                 print(f"  Initialized last seen ID for new user {username} to {latest_fetched_id}")
+                    # The stream is roughly newest-first but NOT strictly
+                    # ID-ordered: twscrape walks the response in document
+                    # order, so a pinned tweet leads the page and quoted
+                    # tweets are interleaved, both possibly with old IDs.
+                    # Old IDs are therefore skipped rather than ended on;
+                    # iteration only stops after several consecutive old
+                    # IDs, which means the main timeline itself has
+                    # reached previously seen territory. Idle users still
+                    # cost about a single page instead of paginating out
+                    # to the full TWEET_FETCH_LIMIT. Each tweet is reduced
+                    # to its flat 14-field row right here, so at most one
+                    # full twscrape Tweet object per user is alive at a
+                    # time - not a list of thirty with all their nested
+                    # user/media payloads.
+                    max_new_id = last_seen_id
+                    consec_old = 0
+                    made_tweet_fetch = True # Request goes out as iteration starts
+                    async for tweet in api.user_tweets_and_replies(user_id, limit=TWEET_FETCH_LIMIT):
+                        if tweet.id <= last_seen_id:
+                            consec_old += 1
+                            if consec_old >= CONSEC_OLD_TWEET_CUTOFF:
+                                break
+                            continue
+                        consec_old = 0
+                        if tweet.id > max_new_id:
+                            max_new_id = tweet.id
+                        # Single hash probe: add() is a no-op for a
+                        # duplicate, so an unchanged size means this ID
+                        # was already processed this run.
+                        pre_len = len(processed_tweet_ids_this_run)
+                        processed_tweet_ids_this_run.add(tweet.id)
+                        if len(processed_tweet_ids_this_run) == pre_len:
+                            print(f"    Skipping duplicate tweet ID {tweet.id} within this run.")
+                            continue
+
+                        # Process tweet data. isoformat is a straight C
+                        # call - no format-string re-parse per tweet like
+                        # strftime - and the aware datetime carries its
+                        # UTC offset in the output, so rows still sort
+                        # and read correctly.
+                        local_time = tweet.date.astimezone(TARGET_TIMEZONE)
+                        tweet_timestamp = local_time.isoformat(sep=' ', timespec='seconds')
+
+                        user_rows.append(_tweet_row(
+                            tweet, username, user_id_str, user_display_name, tweet_timestamp))
+
+                    if user_rows:
+                        print(f"  Found {len(user_rows)} new tweet(s).")
+                        user_rows.reverse() # Collected newest-first; append oldest-first
+
+                    # Update state. New users (last_seen_id == 0) are seeded
+                    # here too since any fetched tweet advances max_new_id.
+                    if max_new_id > last_seen_id:
+                        last_seen_state[username] = max_new_id
+                        state_dirty = True
+                        print(f"  Updated last seen ID for {username} to {max_new_id}")
 
                 except Exception as e:
                     error_msg = f"ERROR fetching/processing tweets for @{username}: {e}"
@@ -282,29 +469,57 @@ async def run_scrape_cycle(api, target_usernames_list, last_seen_state, initial_
             print(f"  {error_msg}")
             cycle_errors.append(error_msg)
 
-        # --- Delay Between Users --- #
-        # print(f"Waiting {DELAY_BETWEEN_USERS_SECONDS} seconds...") # Verbose
-        inter_user_delay = random.uniform(MIN_DELAY_BETWEEN_USERS_SECONDS, MAX_DELAY_BETWEEN_USERS_SECONDS)
-        # print(f"  Waiting {inter_user_delay:.2f}s before next user...") # Verbose
-        await asyncio.sleep(inter_user_delay)
-        # --- End Delay Between Users ---
+        # --- Delay Before Releasing The Worker Slot --- #
+        # Only pace after an actual tweet fetch hit Twitter; fast failures
+        # (unknown user, profile errors) shouldn't inflate cycle duration
+        # with a sleep that exists purely to spread request load.
+        if made_tweet_fetch:
+            inter_user_delay = random.uniform(MIN_DELAY_BETWEEN_USERS_SECONDS, MAX_DELAY_BETWEEN_USERS_SECONDS)
+            # print(f"  Waiting {inter_user_delay:.2f}s before next user...") # Verbose
+            await asyncio.sleep(inter_user_delay)
+        # --- End Delay ---
+
+        return user_rows
+
+    results = await asyncio.gather(*(process_user(u) for u in target_usernames_list),
+                                   return_exceptions=True)
+    for username, result in zip(target_usernames_list, results):
+        if isinstance(result, BaseException):
+            error_msg = f"ERROR in worker for @{username}: {result}"
+            print(f"  {error_msg}")
+            cycle_errors.append(error_msg)
+        else:
+            all_rows_to_append.extend(result)
 
     # --- Sort collected rows --- #
     if all_rows_to_append:
         print("\nSorting collected rows by timestamp...")
         try:
-            all_rows_to_append.sort(key=lambda row_item: row_item[3])
+            # itemgetter runs the key extraction in C instead of a Python
+            # lambda per element; the ISO timestamps sort lexicographically.
+            all_rows_to_append.sort(key=itemgetter(3))
             print("Sorting complete.")
         except Exception as sort_e:
             error_msg = f"ERROR sorting tweet data: {sort_e}. Appending unsorted data."
             print(f"{error_msg}")
             cycle_errors.append(error_msg)
 
-    # --- Append to Google Sheet --- #
-    if all_rows_to_append:
+    # --- Append to Google Sheet (one batchUpdate for header fix + data) --- #
+    if all_rows_to_append or pending_sheet_requests:
         print(f"\nAppending {len(all_rows_to_append)} new rows to Google Sheet...")
         try:
-            worksheet.append_rows(all_rows_to_append, value_input_option='USER_ENTERED')
+            requests_body = list(pending_sheet_requests)
+            if all_rows_to_append:
+                requests_body.append({'appendCells': {
+                    'sheetId': worksheet.id,
+                    'rows': [_cells_row(row) for row in all_rows_to_append],
+                    'fields': 'userEnteredValue'}})
+            _sheets_batch_update({'requests': requests_body})
+            if pending_sheet_requests:
+                # The queued header correction landed with this batch
+                last_seen_state['_header_hash'] = HEADER_HASH
+                state_dirty = True
+                print("Applied header correction to Google Sheet.")
             print("Successfully appended data to Google Sheet.")
         except gspread.exceptions.APIError as api_err:
             error_msg = f"Google Sheets API error appending rows: {api_err}"
@@ -317,17 +532,24 @@ async def run_scrape_cycle(api, target_usernames_list, last_seen_state, initial_
     else:
         print("\nNo new tweet data collected to append to Google Sheet in this cycle.")
 
-    # --- Save Updated State --- #
-    save_last_seen_ids(STATE_FILE, last_seen_state)
+    # --- Save Updated State (only when something actually changed) --- #
+    if state_dirty:
+        save_last_seen_ids(STATE_FILE, last_seen_state)
+    if profile_cache_dirty:
+        save_profile_cache(PROFILE_CACHE_FILE, profile_cache)
     # print(f"Updated state saved to {STATE_FILE}") # Verbose
 
     # --- Notify about errors during the cycle --- #
     if cycle_errors:
+        # Identical errors (e.g. the same rate-limit message for every
+        # user) collapse into one counted line instead of repeating.
+        error_counts = Counter(cycle_errors)
         error_summary = f"⚠️ {len(cycle_errors)} error(s) occurred during the scrape cycle:\n"
-        error_summary += "\n".join([f"- {err}" for err in cycle_errors[:5]]) # Show first 5 errors
-        if len(cycle_errors) > 5:
-            error_summary += f"\n- ... and {len(cycle_errors) - 5} more."
-        send_telegram_notification(error_summary)
+        error_summary += "\n".join(
+            f"- {count}× {msg[:200]}" for msg, count in error_counts.most_common(10))
+        if len(error_counts) > 10:
+            error_summary += f"\n- ... and {len(error_counts) - 10} more distinct error(s)."
+        await send_telegram_notification_async(error_summary)
 
     print(f"--- Scrape cycle finished at {datetime.datetime.now(TARGET_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S %Z')} ---")
     return True # Indicate cycle completed (even with non-critical errors)
@@ -343,58 +565,69 @@ async def main():
         api = API() # Initialize API here
         accounts_added_count = 0
         print(f"Loading Twitter accounts from {ACCOUNTS_FILE}...")
-        with open(ACCOUNTS_FILE, 'r', encoding='utf-8') as f:
-            accounts_data = json.load(f)
-            if not isinstance(accounts_data, list):
-                raise ValueError(f"Expected a list of accounts, but got {type(accounts_data)}")
-
-            for account in accounts_data:
-                acc_username = account.get('username')
-                acc_password = account.get('password')
-                acc_email = account.get('email')
-                acc_email_password = account.get('email_password')
-                acc_cookies = account.get('cookies')
-                acc_proxy = account.get('proxy')
-
-                if not acc_username or not acc_cookies:
-                    print(f"Warning: Skipping account in {ACCOUNTS_FILE} due to missing username or cookies.")
-                    continue
-                try:
+
+        # The file read+parse runs in a worker thread so the event loop
+        # stays responsive during startup even for a large config file.
+        def _read_accounts():
+            with open(ACCOUNTS_FILE, 'rb') as f:
+                return _json_loads(f.read())
+        accounts_data = await asyncio.to_thread(_read_accounts)
+        if not isinstance(accounts_data, list):
+            raise ValueError(f"Expected a list of accounts, but got {type(accounts_data)}")
+
+        # Registration runs concurrently (bounded by a small semaphore so
+        # the pool's sqlite backend isn't hammered) instead of one await
+        # per account - shortens cold start when many accounts exist.
+        add_semaphore = asyncio.Semaphore(4)
+
+        async def _add_account(account):
+            acc_username = account.get('username')
+            acc_cookies = account.get('cookies')
+            if not acc_username or not acc_cookies:
+                print(f"Warning: Skipping account in {ACCOUNTS_FILE} due to missing username or cookies.")
+                return False
+            try:
+                async with add_semaphore:
                     await api.pool.add_account(
-                        acc_username, acc_password, acc_email, acc_email_password,
-                        cookies=acc_cookies, proxy=acc_proxy
+                        acc_username, account.get('password'), account.get('email'),
+                        account.get('email_password'),
+                        cookies=acc_cookies, proxy=account.get('proxy')
                     )
-                    accounts_added_count += 1
-                except Exception as add_err:
-                    print(f"Error adding account '{acc_username}' from config: {add_err}")
-                    # Decide if this should be fatal or just a warning
+                return True
+            except Exception as add_err:
+                print(f"Error adding account '{acc_username}' from config: {add_err}")
+                # Decide if this should be fatal or just a warning
+                return False
 
-            if accounts_added_count == 0:
-                raise ValueError("No valid accounts were loaded and added from config.")
-            else:
-                print(f"Successfully loaded and added {accounts_added_count} account(s) to the pool.")
-                accounts_loaded_successfully = True
+        add_results = await asyncio.gather(*(_add_account(a) for a in accounts_data))
+        accounts_added_count = sum(add_results)
+
+        if accounts_added_count == 0:
+            raise ValueError("No valid accounts were loaded and added from config.")
+        else:
+            print(f"Successfully loaded and added {accounts_added_count} account(s) to the pool.")
+            accounts_loaded_successfully = True
 
     except FileNotFoundError:
         error_msg = f"CRITICAL ERROR: Accounts file '{ACCOUNTS_FILE}' not found."
         print(error_msg)
-        send_telegram_notification(f"🚨 {error_msg} Scraper stopping.")
+        await send_telegram_notification_async(f"🚨 {error_msg} Scraper stopping.")
         return
     except json.JSONDecodeError:
         error_msg = f"CRITICAL ERROR: Could not decode JSON from accounts file '{ACCOUNTS_FILE}'."
         print(error_msg)
-        send_telegram_notification(f"🚨 {error_msg} Scraper stopping.")
+        await send_telegram_notification_async(f"🚨 {error_msg} Scraper stopping.")
         return
     except Exception as e:
         error_msg = f"CRITICAL ERROR loading accounts from {ACCOUNTS_FILE}: {e}"
         print(error_msg)
-        send_telegram_notification(f"🚨 {error_msg} Scraper stopping.")
+        await send_telegram_notification_async(f"🚨 {error_msg} Scraper stopping.")
         return # Stop if accounts can't be loaded
 
     if not accounts_loaded_successfully or not api:
          error_msg = "CRITICAL ERROR: Failed to initialize API or load accounts."
          print(error_msg)
-         send_telegram_notification(f"🚨 {error_msg} Scraper stopping.")
+         await send_telegram_notification_async(f"🚨 {error_msg} Scraper stopping.")
          return
 
 
@@ -403,14 +636,13 @@ async def main():
         cycle_start_time = time.monotonic()
         target_usernames_list = []
         last_seen_state = {}
-        initial_state_keys = set()
         cycle_completed_successfully = False
 
         try:
             # --- Load Usernames and State ---
             print(f"\nLoading configuration for cycle...")
-            with open(USERNAMES_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with open(USERNAMES_FILE, 'rb') as f:
+                data = _json_loads(f.read())
                 target_usernames_list = data.get('target_users', [])
                 if not target_usernames_list:
                     print(f"Warning: No usernames found in {USERNAMES_FILE}. Sleeping until next cycle.")
@@ -419,10 +651,9 @@ async def main():
 
             if target_usernames_list:
                 last_seen_state = load_last_seen_ids(STATE_FILE)
-                initial_state_keys = set(last_seen_state.keys())
 
                 # --- Run Scrape Cycle ---
-                cycle_completed_successfully = await run_scrape_cycle(api, target_usernames_list, last_seen_state, initial_state_keys)
+                cycle_completed_successfully = await run_scrape_cycle(api, target_usernames_list, last_seen_state)
 
             else:
                 # No users to process, just sleep
@@ -432,18 +663,18 @@ async def main():
         except FileNotFoundError as fnf_err:
             error_msg = f"ERROR: Usernames file '{USERNAMES_FILE}' not found: {fnf_err}. Skipping cycle."
             print(error_msg)
-            send_telegram_notification(f"⚠️ {error_msg}")
+            await send_telegram_notification_async(f"⚠️ {error_msg}")
         except json.JSONDecodeError as json_err:
              error_msg = f"ERROR: Could not decode JSON from '{USERNAMES_FILE}': {json_err}. Skipping cycle."
              print(error_msg)
-             send_telegram_notification(f"⚠️ {error_msg}")
+             await send_telegram_notification_async(f"⚠️ {error_msg}")
         except Exception as cycle_e:
             # Catch unexpected errors during the whole cycle (incl. loading files)
             error_msg = f"CRITICAL ERROR during scrape cycle execution: {cycle_e}"
             print(error_msg)
             import traceback
             tb_str = traceback.format_exc()
-            send_telegram_notification(f"🚨 {error_msg}\n```\n{tb_str[:3500]}\n```") # Send traceback snippet
+            await send_telegram_notification_async(f"🚨 {error_msg}\n```\n{tb_str[:3500]}\n```") # Send traceback snippet
 
         # --- Calculate Randomized Sleep Interval --- #
         cycle_end_time = time.monotonic()
@@ -466,6 +697,13 @@ async def main():
 
 if __name__ == "__main__":
     # set_log_level("DEBUG") # Uncomment for more detailed twscrape logs
+    try:
+        # Optional: uvloop speeds up socket-heavy async workloads; the
+        # stdlib selector loop is used when it isn't installed.
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
     send_telegram_notification("🚀 Twitter scraper process starting...")
     try:
         asyncio.run(main())